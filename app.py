@@ -6,7 +6,8 @@ import streamlit as st
 from config.logging_config import setup_logging
 from config.settings import settings
 from rag.retrieval import answer_question, answer_question_stream
-from services.resources import get_llm, get_store
+from rag.single_flight import Overloaded
+from services.resources import get_answer_cache, get_coalescer, get_llm, get_store
 
 setup_logging()
 logger = logging.getLogger(__name__)
@@ -101,6 +102,8 @@ st.markdown(
 
 store = get_store()
 llm = get_llm()
+answer_cache = get_answer_cache()
+coalescer = get_coalescer()
 
 if "history" not in st.session_state:
     st.session_state["history"]: List[Dict] = []
@@ -110,6 +113,12 @@ if "history" not in st.session_state:
     # st.sidebar.header("HR Bot")
 
 
+def citation_label(idx: int, cite: Dict) -> str:
+    # DOCX chunks have no page number.
+    page = f" (page {cite.get('page')})" if cite.get("page") is not None else ""
+    return f"**Source {idx}** — {cite.get('source')}{page} [chunk {cite.get('chunk_id')}], score: {cite.get('score'):.2f}"
+
+
 def render_history() -> None:
     for idx, turn in enumerate(st.session_state["history"]):
         with st.chat_message("user"):
@@ -120,10 +129,7 @@ def render_history() -> None:
                 with st.expander("Citations"):
                     for c_idx, cite in enumerate(turn["citations"], start=1):
                         snippet = cite.get("text") or ""
-                        st.markdown(
-                            f"**Source {c_idx}** — {cite.get('source')} (page {cite.get('page')}) "
-                            f"[chunk {cite.get('chunk_id')}], score: {cite.get('score'):.2f}"
-                        )
+                        st.markdown(citation_label(c_idx, cite))
                         st.write(snippet)
 
 
@@ -154,8 +160,15 @@ if prompt:
         answer_payload = {"answer": "No information found. Please ingest documents first.", "citations": []}
         citations: List[Dict] = []
         stream = iter([answer_payload["answer"]])
+    elif coalescer is not None:
+        try:
+            stream, citations, grounded = coalescer.answer_stream(prompt)
+        except Overloaded as exc:
+            logger.warning("Answer request rejected: %s", exc)
+            citations = []
+            stream = iter(["The assistant is busy right now. Please try again in a minute."])
     else:
-        stream, citations, grounded = answer_question_stream(prompt, store, llm)
+        stream, citations, grounded = answer_question_stream(prompt, store, llm, answer_cache)
     with st.chat_message("user"):
         st.write(prompt)
     with st.chat_message("assistant"):
@@ -169,10 +182,7 @@ if prompt:
             with st.expander("Citations"):
                 for idx, cite in enumerate(citations, start=1):
                     snippet = cite.get("text") or ""
-                    st.markdown(
-                        f"**Source {idx}** — {cite.get('source')} (page {cite.get('page')}) "
-                        f"[chunk {cite.get('chunk_id')}], score: {cite.get('score'):.2f}"
-                    )
+                    st.markdown(citation_label(idx, cite))
                     st.write(snippet)
         answer_text = "".join(chunks).strip()
     st.session_state["history"].append(
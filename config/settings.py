@@ -1,7 +1,7 @@
 import os
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Optional
 
 import streamlit as st
 from dotenv import load_dotenv
@@ -15,11 +15,67 @@ class Settings:
     gemini_api_key: Optional[str]
     gemini_model: str
     gemini_embed_model: str
+    embed_batch_size: int
+    embed_concurrency: int
+    embed_cache_path: Path
+    embed_cache_max_mb: int
+    http_pool_size: int
+    health_ttl: float
+    breaker_failures: int
+    breaker_backoff: float
+    breaker_max_backoff: float
+    health_check_interval: float
+    llm_routing: str
+    hedge_quantile: float
+    hedge_delay: float
+    latency_window: int
+    llm_timeout: float
+    llm_timeouts: Dict[str, float]
+    speculative_retrieval: bool
+    hybrid_retrieval: bool
+    query_embed_timeout: float
+    query_cache_size: int
+    intent_local: bool
+    intent_min_similarity: float
+    intent_min_margin: float
+    answer_cache_size: int
+    answer_cache_ttl: float
+    answer_cache_threshold: float
+    coalesce_answers: bool
+    answer_concurrency: int
+    answer_queue_size: int
+    answer_queue_timeout: float
     vector_store_path: Path
+    index_service_url: Optional[str]
+    index_service_timeout: float
+    index_watch_interval: float
+    index_kind: str
+    ann_index_kind: str
+    ann_threshold: int
+    ivf_nprobe: int
+    hnsw_ef_search: int
     ingest_data_dir: Path
+    ingest_workers: int
+    ingest_queue_size: int
+    chunk_max_tokens: int
+    chunk_overlap_tokens: int
+    tracing: bool
+    trace_dir: Optional[Path]
+    metrics_port: int
+    metrics_host: str
     log_path: Path
 
 
+def parse_timeouts(spec: str) -> Dict[str, float]:
+    """Parse ``"gemini=20,ollama=90"`` into per-provider timeouts in seconds."""
+    timeouts: Dict[str, float] = {}
+    for item in spec.split(","):
+        name, _, seconds = item.partition("=")
+        if name.strip() and seconds.strip():
+            timeouts[name.strip()] = float(seconds)
+    return timeouts
+
+
 def load_settings() -> Settings:
     load_dotenv()
     root = Path(__file__).resolve().parent.parent
@@ -40,8 +96,54 @@ def load_settings() -> Settings:
         gemini_api_key=secret_or_env("GEMINI_API_KEY"),
         gemini_model=secret_or_env("GEMINI_MODEL", "gemini-1.5-flash"),
         gemini_embed_model=secret_or_env("GEMINI_EMBED_MODEL", "text-embedding-004"),
+        embed_batch_size=int(secret_or_env("EMBED_BATCH_SIZE", "64")),
+        embed_concurrency=int(secret_or_env("EMBED_CONCURRENCY", "4")),
+        embed_cache_path=Path(secret_or_env("EMBED_CACHE_PATH", root / "store/embed_cache.sqlite")),
+        embed_cache_max_mb=int(secret_or_env("EMBED_CACHE_MAX_MB", "512")),
+        http_pool_size=int(secret_or_env("HTTP_POOL_SIZE", "32")),
+        health_ttl=float(secret_or_env("HEALTH_TTL", "30")),
+        breaker_failures=int(secret_or_env("BREAKER_FAILURES", "3")),
+        breaker_backoff=float(secret_or_env("BREAKER_BACKOFF", "5")),
+        breaker_max_backoff=float(secret_or_env("BREAKER_MAX_BACKOFF", "300")),
+        health_check_interval=float(secret_or_env("HEALTH_CHECK_INTERVAL", "0")),
+        llm_routing=secret_or_env("LLM_ROUTING", "ordered").lower(),
+        hedge_quantile=float(secret_or_env("HEDGE_QUANTILE", "0.95")),
+        hedge_delay=float(secret_or_env("HEDGE_DELAY", "2.0")),
+        latency_window=int(secret_or_env("LATENCY_WINDOW", "200")),
+        llm_timeout=float(secret_or_env("LLM_TIMEOUT", "60")),
+        llm_timeouts=parse_timeouts(secret_or_env("LLM_TIMEOUTS", "")),
+        speculative_retrieval=secret_or_env("SPECULATIVE_RETRIEVAL", "true").lower() in ("1", "true", "yes"),
+        hybrid_retrieval=secret_or_env("HYBRID_RETRIEVAL", "true").lower() in ("1", "true", "yes"),
+        query_embed_timeout=float(secret_or_env("QUERY_EMBED_TIMEOUT", "2.0")),
+        query_cache_size=int(secret_or_env("QUERY_CACHE_SIZE", "1024")),
+        intent_local=secret_or_env("INTENT_LOCAL", "true").lower() in ("1", "true", "yes"),
+        intent_min_similarity=float(secret_or_env("INTENT_MIN_SIMILARITY", "0.3")),
+        intent_min_margin=float(secret_or_env("INTENT_MIN_MARGIN", "0.04")),
+        answer_cache_size=int(secret_or_env("ANSWER_CACHE_SIZE", "512")),
+        answer_cache_ttl=float(secret_or_env("ANSWER_CACHE_TTL", "86400")),
+        answer_cache_threshold=float(secret_or_env("ANSWER_CACHE_THRESHOLD", "0.92")),
+        coalesce_answers=secret_or_env("COALESCE_ANSWERS", "true").lower() in ("1", "true", "yes"),
+        answer_concurrency=int(secret_or_env("ANSWER_CONCURRENCY", "2")),
+        answer_queue_size=int(secret_or_env("ANSWER_QUEUE_SIZE", "32")),
+        answer_queue_timeout=float(secret_or_env("ANSWER_QUEUE_TIMEOUT", "60")),
         vector_store_path=Path(secret_or_env("VECTOR_STORE_PATH", root / "store/index.faiss")),
+        index_service_url=secret_or_env("INDEX_SERVICE_URL") or None,
+        index_service_timeout=float(secret_or_env("INDEX_SERVICE_TIMEOUT", "30")),
+        index_watch_interval=float(secret_or_env("INDEX_WATCH_INTERVAL", "2")),
+        index_kind=secret_or_env("INDEX_KIND", "auto"),
+        ann_index_kind=secret_or_env("ANN_INDEX_KIND", "ivf"),
+        ann_threshold=int(secret_or_env("ANN_THRESHOLD", "50000")),
+        ivf_nprobe=int(secret_or_env("IVF_NPROBE", "16")),
+        hnsw_ef_search=int(secret_or_env("HNSW_EF_SEARCH", "64")),
         ingest_data_dir=Path(secret_or_env("INGEST_DATA_DIR", root / "data/uploads")),
+        ingest_workers=int(secret_or_env("INGEST_WORKERS", str(min(4, os.cpu_count() or 1)))),
+        ingest_queue_size=int(secret_or_env("INGEST_QUEUE_SIZE", "8")),
+        chunk_max_tokens=int(secret_or_env("CHUNK_MAX_TOKENS", "320")),
+        chunk_overlap_tokens=int(secret_or_env("CHUNK_OVERLAP_TOKENS", "40")),
+        tracing=secret_or_env("TRACING", "false").lower() in ("1", "true", "yes"),
+        trace_dir=Path(secret_or_env("TRACE_DIR")) if secret_or_env("TRACE_DIR") else None,
+        metrics_port=int(secret_or_env("METRICS_PORT", "0")),
+        metrics_host=secret_or_env("METRICS_HOST", "127.0.0.1"),
         log_path=Path(secret_or_env("LOG_PATH", root / "logs/app.log")),
     )
 
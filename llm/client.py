@@ -1,12 +1,17 @@
+import contextvars
 import logging
+import queue
+import threading
+import time
 from dataclasses import dataclass
-from typing import Iterator, List, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 import google.generativeai as genai
-import ollama
-from ollama import Client as OllamaClient
 
 from config.settings import settings
+from llm.health import HealthMonitor, ProviderHealth
+from llm.pools import ollama_client
+from services import tracing
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +24,12 @@ class ProviderStatus:
 
 
 class BaseLLM:
+    name = "llm"
+
+    def configured(self) -> bool:
+        """Cheap local check (no network) that the provider can be used at all."""
+        return True
+
     def generate(self, prompt: str) -> str:  # pragma: no cover - interface
         raise NotImplementedError
 
@@ -29,26 +40,25 @@ class BaseLLM:
         yield self.generate(prompt)
 
 
+
 class OllamaLLM(BaseLLM):
+    name = "ollama"
+
     def __init__(self) -> None:
-        self.client = OllamaClient(host=settings.ollama_host)
+        self.client = ollama_client(settings.ollama_host)
         self.model = settings.ollama_model
 
+    def _messages(self, prompt: str) -> List[dict]:
+        return [{"role": "user", "content": prompt}]
+
     def generate(self, prompt: str) -> str:
         logger.info("Using Ollama model %s", self.model)
-        response = self.client.chat(
-            model=self.model,
-            messages=[{"role": "user", "content": prompt}],
-        )
+        response = self.client.chat(model=self.model, messages=self._messages(prompt))
         return response["message"]["content"]
 
     def stream(self, prompt: str) -> Iterator[str]:
         logger.info("Streaming with Ollama model %s", self.model)
-        stream = self.client.chat(
-            model=self.model,
-            messages=[{"role": "user", "content": prompt}],
-            stream=True,
-        )
+        stream = self.client.chat(model=self.model, messages=self._messages(prompt), stream=True)
         for chunk in stream:
             content = chunk.get("message", {}).get("content", "")
             if content:
@@ -63,25 +73,34 @@ class OllamaLLM(BaseLLM):
 
 
 class GeminiLLM(BaseLLM):
+    name = "gemini"
+
     def __init__(self) -> None:
         self.api_key = settings.gemini_api_key
         self.model = settings.gemini_model
+        # One handle for every call instead of a new model object per request.
+        self._handle: Optional[genai.GenerativeModel] = None
         if self.api_key:
             genai.configure(api_key=self.api_key)
+            self._handle = genai.GenerativeModel(self.model)
 
-    def generate(self, prompt: str) -> str:
-        if not self.api_key:
+    def configured(self) -> bool:
+        return bool(self.api_key)
+
+    def _model(self) -> genai.GenerativeModel:
+        if self._handle is None:
             raise RuntimeError("Gemini API key not configured")
+        return self._handle
+
+    def generate(self, prompt: str) -> str:
+        model = self._model()
         logger.info("Using Gemini model %s", self.model)
-        model = genai.GenerativeModel(self.model)
         response = model.generate_content(prompt)
         return response.text
 
     def stream(self, prompt: str) -> Iterator[str]:
-        if not self.api_key:
-            raise RuntimeError("Gemini API key not configured")
+        model = self._model()
         logger.info("Streaming with Gemini model %s", self.model)
-        model = genai.GenerativeModel(self.model)
         response = model.generate_content(prompt, stream=True)
         for chunk in response:
             text = getattr(chunk, "text", None)
@@ -92,56 +111,288 @@ class GeminiLLM(BaseLLM):
         if not self.api_key:
             return ProviderStatus("gemini", False, "API key missing")
         try:
-            model = genai.GenerativeModel(self.model)
-            _ = model.count_tokens("ping")
+            _ = self._model().count_tokens("ping")
             return ProviderStatus("gemini", True, "reachable")
         except Exception as exc:  # pylint: disable=broad-except
             return ProviderStatus("gemini", False, str(exc))
 
 
+class _StreamTimer:
+    """Time to first chunk and the streaming rate of one provider's stream."""
+
+    def __init__(self, provider: str, start: Optional[float] = None) -> None:
+        self.provider = provider
+        self.start = time.perf_counter() if start is None else start
+        self.first: Optional[float] = None
+        self.count = 0
+
+    def chunk(self) -> None:
+        if self.first is None:
+            self.first = time.perf_counter()
+            tracing.observe("ttft", self.first - self.start, provider=self.provider)
+        self.count += 1
+
+    def finish(self, span: tracing.Span) -> None:
+        if self.first is None:
+            return
+        elapsed = time.perf_counter() - self.first
+        span.set(provider=self.provider, ttft_ms=round((self.first - self.start) * 1000, 1), chunks=self.count)
+        if self.count > 1 and elapsed > 0:
+            tracing.observe("chunk_rate", (self.count - 1) / elapsed, provider=self.provider)
+
+
+class _Attempt:
+    """One provider's stream in a hedged request, fed into the request's event queue."""
+
+    def __init__(self, provider: BaseLLM, events: "queue.Queue[Tuple[_Attempt, Optional[str], Any]]") -> None:
+        self.provider = provider
+        self.events = events
+        self.started = time.perf_counter()
+        self.last_output = self.started
+        self.cancelled = threading.Event()
+        self.failed = False
+
+    def run(self, prompt: str) -> None:
+        # The provider's timeout counts from here, not from when the attempt was queued.
+        self.started = self.last_output = time.perf_counter()
+        chunks = self.provider.stream(prompt)
+        try:
+            for chunk in chunks:
+                if self.cancelled.is_set():
+                    return
+                self.events.put((self, chunk, None))
+            self.events.put((self, None, None))
+        except Exception as exc:  # pylint: disable=broad-except
+            self.events.put((self, None, exc))
+        finally:
+            # Closing the generator releases the provider's HTTP response.
+            close = getattr(chunks, "close", None)
+            if close is not None:
+                close()
+
+
 class LLMRouter:
-    def __init__(self) -> None:
-        self.providers: List[BaseLLM] = [GeminiLLM(),OllamaLLM()]
+    """Routes LLM calls across providers behind circuit breakers.
+
+    ``ordered`` routing tries providers in turn and falls back when one fails. ``hedged``
+    routing starts the first provider and, if it has produced nothing after its recent
+    HEDGE_QUANTILE time-to-first-token, also starts the next one; whichever streams first
+    wins and the others are cancelled.
+    """
+
+    def __init__(self, providers: Optional[List[BaseLLM]] = None, routing: Optional[str] = None) -> None:
+        self.providers: List[BaseLLM] = providers or [GeminiLLM(), OllamaLLM()]
+        self.routing = routing or settings.llm_routing
+        self.wins: Dict[str, int] = {provider.name: 0 for provider in self.providers}
+        self.last_winner: Optional[str] = None
+        # Request paths consult the breakers only; probes run via provider_statuses() or the monitor.
+        self.health = {provider.name: ProviderHealth(provider.name, provider.available) for provider in self.providers}
+        self.monitor = HealthMonitor(list(self.health.values()), settings.health_check_interval)
+        self.monitor.start()
 
     def provider_statuses(self) -> List[ProviderStatus]:
-        return [provider.available() for provider in self.providers]
+        return [self.health[provider.name].status() for provider in self.providers]
+
+    def _usable(self, provider: BaseLLM) -> Tuple[bool, str]:
+        if not provider.configured():
+            return False, "not configured"
+        health = self.health[provider.name]
+        if not health.allow():
+            return False, f"circuit {health.state}: {health.last_error}"
+        return True, ""
 
     def generate(self, prompt: str) -> str:
+        if self.routing == "hedged":
+            return "".join(self._hedged(prompt, "llm.generate"))
         last_error: Optional[str] = None
-        for provider in self.providers:
-            status = provider.available()
-            if not status.available:
-                last_error = status.detail
-                logger.warning("%s unavailable: %s", status.name, status.detail)
-                continue
-            try:
-                return provider.generate(prompt)
-            except Exception as exc:  # pylint: disable=broad-except
-                last_error = str(exc)
-                logger.exception("Provider %s failed", status.name)
-        raise RuntimeError(f"No LLM providers available. Last error: {last_error}")
-
-    def stream(self, prompt: str) -> Iterator[str]:
-        def _generator() -> Iterator[str]:
-            last_error: Optional[str] = None
+        with tracing.span("llm.generate", prompt_chars=len(prompt)) as span:
             for provider in self.providers:
-                status = provider.available()
-                if not status.available:
-                    last_error = status.detail
-                    logger.warning("%s unavailable: %s", status.name, status.detail)
+                usable, detail = self._usable(provider)
+                if not usable:
+                    last_error = detail
+                    logger.debug("%s skipped: %s", provider.name, detail)
                     continue
                 try:
-                    # Prefer true streaming if available
-                    if hasattr(provider, "stream"):
-                        yield from provider.stream(prompt)  # type: ignore
-                    else:
-                        yield provider.generate(prompt)
-                    return
+                    answer = provider.generate(prompt)
+                    self.health[provider.name].record_success()
+                    span.set(provider=provider.name)
+                    tracing.increment("llm", provider=provider.name, mode="generate", outcome="ok")
+                    return answer
                 except Exception as exc:  # pylint: disable=broad-except
                     last_error = str(exc)
-                    logger.exception("Provider %s failed", status.name)
+                    self.health[provider.name].record_failure(last_error)
+                    tracing.increment("llm", provider=provider.name, mode="generate", outcome="error")
+                    logger.exception("Provider %s failed", provider.name)
             raise RuntimeError(f"No LLM providers available. Last error: {last_error}")
 
+    @staticmethod
+    def _measured(provider: BaseLLM, chunks: Iterator[str], span: tracing.Span) -> Iterator[str]:
+        """Pass ``chunks`` through, recording time to first chunk and the streaming rate."""
+        timer = _StreamTimer(provider.name)
+        try:
+            for chunk in chunks:
+                timer.chunk()
+                yield chunk
+        finally:
+            timer.finish(span)
+
+    def timeout(self, provider: BaseLLM) -> float:
+        return settings.llm_timeouts.get(provider.name, settings.llm_timeout)
+
+    def hedge_delay(self, provider: BaseLLM) -> float:
+        delay = self.health[provider.name].latency.quantile(settings.hedge_quantile)
+        return settings.hedge_delay if delay is None else delay
+
+    def _record_win(self, attempt: _Attempt, hedged: bool) -> None:
+        name = attempt.provider.name
+        self.wins[name] = self.wins.get(name, 0) + 1
+        self.last_winner = name
+        self.health[name].latency.record(attempt.last_output - attempt.started)
+        tracing.increment("llm", provider=name, mode="hedged", outcome="won")
+        if hedged:
+            logger.info("Hedged LLM request won by %s", name)
+
+    def _hedged(self, prompt: str, span_name: str) -> Iterator[str]:
+        with tracing.span(span_name, prompt_chars=len(prompt), routing="hedged") as span:
+            events: "queue.Queue[Tuple[_Attempt, Optional[str], Any]]" = queue.Queue()
+            attempts: List[_Attempt] = []
+            candidates = iter(self.providers)
+            last_error: Optional[str] = None
+
+            def launch() -> bool:
+                nonlocal last_error
+                for provider in candidates:
+                    usable, detail = self._usable(provider)
+                    if not usable:
+                        last_error = detail
+                        continue
+                    attempt = _Attempt(provider, events)
+                    attempts.append(attempt)
+                    # One thread per attempt: a shared pool would make attempts queue behind
+                    # whole streams, including cancelled losers still blocked on network reads.
+                    threading.Thread(
+                        target=contextvars.copy_context().run,
+                        args=(attempt.run, prompt),
+                        name=f"llm-hedge-{provider.name}",
+                        daemon=True,
+                    ).start()
+                    return True
+                return False
+
+            def fail(attempt: _Attempt, detail: str, outcome: str) -> None:
+                nonlocal last_error
+                attempt.failed = True
+                attempt.cancelled.set()
+                last_error = f"{attempt.provider.name}: {detail}"
+                self.health[attempt.provider.name].record_failure(detail)
+                tracing.increment("llm", provider=attempt.provider.name, mode="hedged", outcome=outcome)
+                logger.warning("Provider %s failed: %s", attempt.provider.name, detail)
+
+            winner: Optional[_Attempt] = None
+            first: Optional[str] = None
+            can_hedge = launch()
+            try:
+                while winner is None:
+                    live = [attempt for attempt in attempts if not attempt.failed]
+                    if not live and not launch():
+                        raise RuntimeError(f"No LLM providers available. Last error: {last_error}")
+                    live = [attempt for attempt in attempts if not attempt.failed]
+                    newest = attempts[-1]
+                    deadlines = [attempt.started + self.timeout(attempt.provider) for attempt in live]
+                    if can_hedge:
+                        deadlines.append(newest.started + self.hedge_delay(newest.provider))
+                    try:
+                        attempt, chunk, error = events.get(timeout=max(min(deadlines) - time.perf_counter(), 0))
+                    except queue.Empty:
+                        now = time.perf_counter()
+                        for attempt in live:
+                            limit = self.timeout(attempt.provider)
+                            if now - attempt.started >= limit:
+                                fail(attempt, f"no output after {limit:g}s", "timeout")
+                        if can_hedge and now >= newest.started + self.hedge_delay(newest.provider):
+                            can_hedge = launch()
+                        continue
+                    if attempt.failed:
+                        continue
+                    if error is not None:
+                        fail(attempt, str(error), "error")
+                        continue
+                    attempt.last_output = time.perf_counter()
+                    winner, first = attempt, chunk
+                for attempt in attempts:
+                    if attempt is not winner and not attempt.failed:
+                        attempt.cancelled.set()
+                        health = self.health[attempt.provider.name]
+                        # Censored sample: the loser's first token would have come even later.
+                        health.latency.record(time.perf_counter() - attempt.started)
+                        # A cancelled loser may hold the half-open trial; let the next request take it.
+                        health.release_trial()
+                        tracing.increment("llm", provider=attempt.provider.name, mode="hedged", outcome="lost")
+                self._record_win(winner, hedged=len(attempts) > 1)
+                span.set(winner=winner.provider.name, attempts=len(attempts))
+                timer = _StreamTimer(winner.provider.name, winner.started)
+                chunk = first
+                limit = self.timeout(winner.provider)
+                while chunk is not None:
+                    timer.chunk()
+                    yield chunk
+                    chunk = None
+                    while True:
+                        try:
+                            attempt, chunk, error = events.get(timeout=limit)
+                        except queue.Empty as exc:
+                            self.health[winner.provider.name].record_failure(f"stalled for {limit:g}s")
+                            raise RuntimeError(f"{winner.provider.name} stalled for {limit:g}s") from exc
+                        if attempt is winner:
+                            break
+                    if error is not None:
+                        self.health[winner.provider.name].record_failure(str(error))
+                        raise error
+                self.health[winner.provider.name].record_success()
+                timer.finish(span)
+            except GeneratorExit:
+                # Consumer stopped reading mid-stream; the provider itself was fine.
+                if winner is not None:
+                    self.health[winner.provider.name].record_success()
+                raise
+            finally:
+                for attempt in attempts:
+                    attempt.cancelled.set()
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        if self.routing == "hedged":
+            return self._hedged(prompt, "llm.stream")
+
+        def _generator() -> Iterator[str]:
+            last_error: Optional[str] = None
+            with tracing.span("llm.stream", prompt_chars=len(prompt)) as span:
+                for provider in self.providers:
+                    usable, detail = self._usable(provider)
+                    if not usable:
+                        last_error = detail
+                        logger.debug("%s skipped: %s", provider.name, detail)
+                        continue
+                    try:
+                        # Prefer true streaming if available
+                        if hasattr(provider, "stream"):
+                            chunks = provider.stream(prompt)  # type: ignore
+                        else:
+                            chunks = iter([provider.generate(prompt)])
+                        yield from self._measured(provider, chunks, span) if tracing.enabled() else chunks
+                        self.health[provider.name].record_success()
+                        tracing.increment("llm", provider=provider.name, mode="stream", outcome="ok")
+                        return
+                    except GeneratorExit:
+                        # Consumer stopped reading mid-stream; the provider itself was fine.
+                        self.health[provider.name].record_success()
+                        raise
+                    except Exception as exc:  # pylint: disable=broad-except
+                        last_error = str(exc)
+                        self.health[provider.name].record_failure(last_error)
+                        tracing.increment("llm", provider=provider.name, mode="stream", outcome="error")
+                        logger.exception("Provider %s failed", provider.name)
+                raise RuntimeError(f"No LLM providers available. Last error: {last_error}")
+
         return _generator()
 
 
@@ -0,0 +1,216 @@
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# SQLite caps the number of bound parameters per statement; stay well below it.
+SQLITE_MAX_PARAMS = 500
+# Cache hits only bump ``last_used`` in memory; they are written out in one statement once
+# this many are pending or this many seconds have passed (or with the next insert).
+_TOUCH_FLUSH_ENTRIES = 1024
+_TOUCH_FLUSH_SECONDS = 30.0
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def text_hash(text: str) -> bytes:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    """Persistent embedding cache keyed by (provider/model, sha256 of normalized text).
+
+    Vectors are stored as raw float32 blobs in SQLite. Entries are evicted least recently
+    used first once the stored vector bytes exceed ``max_bytes``.
+    """
+
+    def __init__(self, path: Path, max_bytes: int) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL,"
+            " hash BLOB NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " last_used REAL NOT NULL,"
+            " PRIMARY KEY (model, hash))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_lru ON embeddings(last_used)")
+        self._conn.commit()
+        row = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()
+        self._entries, self._bytes = int(row[0]), int(row[1])
+        self._touched: Dict[Tuple[str, bytes], float] = {}
+        self._touched_at = time.monotonic()
+
+    def get_many(self, model: str, texts: List[str]) -> Tuple[Dict[int, np.ndarray], List[int]]:
+        """Return cached vectors by input position, plus the positions that missed."""
+        hashes = [text_hash(text) for text in texts]
+        found: Dict[bytes, np.ndarray] = {}
+        now = time.time()
+        with self._lock:
+            for chunk in _chunked(sorted(set(hashes)), SQLITE_MAX_PARAMS):
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({placeholders})",
+                    [model, *chunk],
+                ).fetchall()
+                for digest, blob in rows:
+                    found[bytes(digest)] = np.frombuffer(blob, dtype="float32")
+            for digest in found:
+                self._touched[(model, digest)] = now
+            # Keeps SQLite writes off the query path: recency only needs to be roughly right for LRU.
+            overdue = time.monotonic() - self._touched_at >= _TOUCH_FLUSH_SECONDS
+            if len(self._touched) >= _TOUCH_FLUSH_ENTRIES or overdue:
+                self._flush_touched()
+                self._conn.commit()
+        cached: Dict[int, np.ndarray] = {}
+        missing: List[int] = []
+        for pos, digest in enumerate(hashes):
+            if digest in found:
+                cached[pos] = found[digest]
+            else:
+                missing.append(pos)
+        self.hits += len(cached)
+        self.misses += len(missing)
+        return cached, missing
+
+    def put_many(self, model: str, texts: List[str], vectors: np.ndarray) -> None:
+        now = time.time()
+        vectors = np.ascontiguousarray(vectors, dtype="float32")
+        rows = [(model, text_hash(text), vectors[i].tobytes(), now) for i, text in enumerate(texts)]
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings(model, hash, vector, last_used) VALUES (?, ?, ?, ?)", rows
+            )
+            inserted = self._conn.total_changes - before
+            self._entries += inserted
+            self._bytes += inserted * (vectors.shape[1] * 4 if len(vectors) else 0)
+            self._flush_touched()
+            if self._bytes > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def _flush_touched(self) -> None:
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE model = ? AND hash = ?",
+                [(used, model, digest) for (model, digest), used in self._touched.items()],
+            )
+            self._touched.clear()
+        self._touched_at = time.monotonic()
+
+    def _evict(self) -> None:
+        # Free down to 90% of the budget so we don't evict on every subsequent insert.
+        target = int(self.max_bytes * 0.9)
+        while self._bytes > target:
+            rows = self._conn.execute(
+                "SELECT rowid, LENGTH(vector) FROM embeddings ORDER BY last_used LIMIT ?", (SQLITE_MAX_PARAMS,)
+            ).fetchall()
+            if not rows:
+                break
+            victims: List[int] = []
+            for rowid, size in rows:
+                victims.append(rowid)
+                self._bytes -= int(size)
+                if self._bytes <= target:
+                    break
+            placeholders = ",".join("?" * len(victims))
+            self._conn.execute(f"DELETE FROM embeddings WHERE rowid IN ({placeholders})", victims)
+            self._entries -= len(victims)
+        logger.info("Embedding cache evicted down to %d entries (%d bytes)", self._entries, self._bytes)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+            self._touched.clear()
+            self._entries = self._bytes = 0
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": self._entries,
+            "bytes": self._bytes,
+        }
+
+
+class QueryCache:
+    """In-process LRU of normalized query text -> normalized float32 query vector.
+
+    Keys are whitespace/Unicode-normalized and case-folded, so "What is PTO?" and
+    "what is  PTO?" share an entry. Cached arrays are read-only and safe to share.
+    """
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(query: str) -> str:
+        return normalize_text(query).casefold()
+
+    def get(self, query: str) -> Optional[np.ndarray]:
+        key = self.key(query)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, query: str, vector: np.ndarray) -> None:
+        if self.max_entries <= 0:
+            return
+        vector = np.array(vector, dtype="float32")
+        vector.setflags(write=False)
+        key = self.key(query)
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def _chunked(items: List[bytes], size: int) -> Iterable[List[bytes]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
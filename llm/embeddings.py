@@ -1,13 +1,17 @@
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import Callable, Dict, List, Optional
 
 import google.generativeai as genai
 import numpy as np
-import ollama
-from ollama import Client as OllamaClient
+from ollama import ResponseError
 
 from config.settings import settings
+from llm.embedding_cache import EmbeddingCache
+from llm.health import HealthMonitor, ProviderHealth
+from llm.pools import ollama_client
+from services import tracing
 
 logger = logging.getLogger(__name__)
 
@@ -19,26 +23,95 @@ class ProviderStatus:
     detail: str = ""
 
 
+# Gemini rejects batch requests with more than 100 contents.
+GEMINI_MAX_BATCH = 100
+
+
+def _batches(texts: List[str], size: int) -> List[List[str]]:
+    size = max(size, 1)
+    return [texts[start:start + size] for start in range(0, len(texts), size)]
+
+
+def _embed_batches(
+    batches: List[List[str]], embed_batch: Callable[[List[str]], List[List[float]]], concurrency: int
+) -> np.ndarray:
+    """Run ``embed_batch`` over ``batches`` on a bounded pool, keeping input order."""
+    if not batches:
+        return np.zeros((0, 0), dtype="float32")
+    if concurrency <= 1 or len(batches) == 1:
+        results = [embed_batch(batch) for batch in batches]
+    else:
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(batches))) as pool:
+            # map() yields results in submission order, so rows line up with the input texts.
+            results = list(pool.map(embed_batch, batches))
+    return _stack(results)
+
+
+def _stack(results: List[List[List[float]]]) -> np.ndarray:
+    dim = len(results[0][0])
+    matrix = np.empty((sum(len(r) for r in results), dim), dtype="float32")
+    row = 0
+    for result in results:
+        matrix[row:row + len(result)] = result
+        row += len(result)
+    return matrix
+
+
+def _batch_unsupported(exc: ResponseError) -> bool:
+    # Servers without /api/embed answer 404; some builds reject a list ``input`` with 400.
+    return exc.status_code in (400, 404)
+
+
 class EmbeddingProvider:
-    def embed(self, texts: List[str]) -> List[List[float]]:  # pragma: no cover - interface
+    name = "embed"
+
+    def configured(self) -> bool:
+        """Cheap local check (no network) that the provider can be used at all."""
+        return True
+
+    def embed(self, texts: List[str]) -> np.ndarray:  # pragma: no cover - interface
+        """Return a contiguous float32 matrix with one row per input text, in input order."""
         raise NotImplementedError
 
     def available(self) -> bool:  # pragma: no cover - interface
         raise NotImplementedError
 
+    def status(self) -> ProviderStatus:
+        return ProviderStatus(self.name, self.available())
+
 
 class OllamaEmbeddings(EmbeddingProvider):
+    name = "ollama-embed"
+
     def __init__(self) -> None:
-        self.client = OllamaClient(host=settings.ollama_host)
+        self.client = ollama_client(settings.ollama_host)
         self.model = settings.ollama_embed_model
+        self.batch_size = settings.embed_batch_size
+        self.concurrency = settings.embed_concurrency
+        # Older clients/servers only expose the single-prompt /api/embeddings endpoint.
+        self._multi_input = hasattr(self.client, "embed")
 
-    def embed(self, texts: List[str]) -> List[List[float]]:
-        logger.info("Embedding with Ollama model %s", self.model)
-        vectors: List[List[float]] = []
-        for text in texts:
-            resp = self.client.embeddings(model=self.model, prompt=text)
-            vectors.append(resp["embedding"])
-        return vectors
+    def _embed_one(self, text: str) -> List[float]:
+        return self.client.embeddings(model=self.model, prompt=text)["embedding"]
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        if self._multi_input:
+            try:
+                return self.client.embed(model=self.model, input=texts)["embeddings"]
+            except ResponseError as exc:
+                # Anything else (timeouts, connection errors) is left to the router's retries.
+                if not _batch_unsupported(exc):
+                    raise
+                logger.warning("Ollama /api/embed unavailable; falling back to per-text embeddings")
+                self._multi_input = False
+        return [self._embed_one(text) for text in texts]
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        logger.info("Embedding %d texts with Ollama model %s", len(texts), self.model)
+        if not self._multi_input:
+            # Without a multi-input endpoint, spread single requests across the pool instead.
+            return _embed_batches([[text] for text in texts], self._embed_batch, self.concurrency)
+        return _embed_batches(_batches(texts, self.batch_size), self._embed_batch, self.concurrency)
 
     def available(self) -> bool:
         try:
@@ -56,59 +129,107 @@ class OllamaEmbeddings(EmbeddingProvider):
 
 
 class GeminiEmbeddings(EmbeddingProvider):
+    name = "gemini-embed"
+
     def __init__(self) -> None:
         self.api_key: Optional[str] = settings.gemini_api_key
         self.model = settings.gemini_embed_model
         if self.api_key:
             genai.configure(api_key=self.api_key)
+        self.batch_size = min(settings.embed_batch_size, GEMINI_MAX_BATCH)
+        self.concurrency = settings.embed_concurrency
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        # embed_content accepts a list of contents and returns one embedding per entry.
+        return genai.embed_content(model=self.model, content=texts)["embedding"]
 
-    def embed(self, texts: List[str]) -> List[List[float]]:
+    def embed(self, texts: List[str]) -> np.ndarray:
         if not self.api_key:
             raise RuntimeError("Gemini API key not configured")
-        logger.info("Embedding with Gemini model %s", self.model)
-        vectors: List[List[float]] = []
-        for text in texts:
-            result = genai.embed_content(model=self.model, content=text)
-            vectors.append(result["embedding"])
-        return vectors
+        logger.info("Embedding %d texts with Gemini model %s", len(texts), self.model)
+        return _embed_batches(_batches(texts, self.batch_size), self._embed_batch, self.concurrency)
 
     def available(self) -> bool:
         return bool(self.api_key)
 
+    def configured(self) -> bool:
+        return bool(self.api_key)
+
     def status(self) -> ProviderStatus:
         if not self.api_key:
             return ProviderStatus("gemini-embed", False, "API key missing")
         return ProviderStatus("gemini-embed", True, "configured")
 
 
+def _merge_cached(
+    n: int, cached: Dict[int, np.ndarray], missing: List[int], fresh: Optional[np.ndarray]
+) -> np.ndarray:
+    dim = fresh.shape[1] if fresh is not None else len(next(iter(cached.values())))
+    matrix = np.empty((n, dim), dtype="float32")
+    for pos, vector in cached.items():
+        matrix[pos] = vector
+    if fresh is not None:
+        matrix[missing] = fresh
+    return matrix
+
+
 class EmbeddingRouter:
-    def __init__(self) -> None:
-        gemini = GeminiEmbeddings()
-        ollama = OllamaEmbeddings()
-        # Prefer Gemini when API key is present (cloud-friendly); otherwise fall back to Ollama-first.
-        if gemini.available():
-            self.providers: List[EmbeddingProvider] = [gemini, ollama]
+    def __init__(self, providers: Optional[List[EmbeddingProvider]] = None, use_cache: bool = True) -> None:
+        if providers:
+            self.providers: List[EmbeddingProvider] = providers
         else:
-            self.providers: List[EmbeddingProvider] = [ollama, gemini]
+            gemini = GeminiEmbeddings()
+            ollama = OllamaEmbeddings()
+            # Prefer Gemini when API key is present (cloud-friendly); otherwise fall back to Ollama-first.
+            self.providers = [gemini, ollama] if gemini.available() else [ollama, gemini]
+        self.health = {provider.name: ProviderHealth(provider.name, provider.status) for provider in self.providers}
+        self.monitor = HealthMonitor(list(self.health.values()), settings.health_check_interval)
+        self.monitor.start()
+        self.cache: Optional[EmbeddingCache] = None
+        if use_cache and settings.embed_cache_max_mb > 0:
+            self.cache = EmbeddingCache(settings.embed_cache_path, settings.embed_cache_max_mb * 1024 * 1024)
 
     def provider_statuses(self) -> List[ProviderStatus]:
-        statuses: List[ProviderStatus] = []
-        for provider in self.providers:
-            if hasattr(provider, "status"):
-                statuses.append(provider.status())  # type: ignore
-            else:  # pragma: no cover - fallback
-                statuses.append(ProviderStatus(provider.__class__.__name__, provider.available()))
-        return statuses
+        return [self.health[provider.name].status() for provider in self.providers]
+
+    def available(self) -> bool:
+        """False when every configured provider's circuit is open (no network calls)."""
+        return any(provider.configured() and self.health[provider.name].ready() for provider in self.providers)
+
+    @staticmethod
+    def _cache_namespace(provider: EmbeddingProvider) -> str:
+        # Vectors from different providers/models live in different spaces and must never mix.
+        return f"{provider.__class__.__name__}:{getattr(provider, 'model', '')}"
+
+    def _embed_cached(self, provider: EmbeddingProvider, texts: List[str]) -> np.ndarray:
+        if self.cache is None or not texts:
+            return np.ascontiguousarray(provider.embed(texts), dtype="float32")
+        namespace = self._cache_namespace(provider)
+        cached, missing = self.cache.get_many(namespace, texts)
+        fresh: Optional[np.ndarray] = None
+        if missing:
+            fresh = np.ascontiguousarray(provider.embed([texts[i] for i in missing]), dtype="float32")
+            self.cache.put_many(namespace, [texts[i] for i in missing], fresh)
+        return _merge_cached(len(texts), cached, missing, fresh)
+
+    def cache_stats(self) -> Dict[str, float]:
+        return self.cache.stats() if self.cache is not None else {}
 
     def embed(self, texts: List[str]) -> np.ndarray:
         last_error: Optional[str] = None
-        for provider in self.providers:
-            if not provider.available():
-                continue
-            try:
-                vectors = provider.embed(texts)
-                return np.array(vectors, dtype="float32")
-            except Exception as exc:  # pylint: disable=broad-except
-                last_error = str(exc)
-                logger.exception("Embedding provider failed")
-        raise RuntimeError(f"No embedding providers available. Last error: {last_error}")
+        with tracing.span("embed", texts=len(texts)) as span:
+            for provider in self.providers:
+                health = self.health[provider.name]
+                if not provider.configured() or not health.allow():
+                    continue
+                try:
+                    vectors = self._embed_cached(provider, texts)
+                    health.record_success()
+                    span.set(provider=provider.name)
+                    tracing.increment("embed", len(texts), provider=provider.name)
+                    return vectors
+                except Exception as exc:  # pylint: disable=broad-except
+                    last_error = str(exc)
+                    health.record_failure(last_error)
+                    logger.exception("Embedding provider failed")
+            raise RuntimeError(f"No embedding providers available. Last error: {last_error}")
@@ -0,0 +1,163 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, List, Optional
+
+from config.settings import settings
+from services import tracing
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class LatencyWindow:
+    """The last ``size`` latency samples (seconds) of one provider."""
+
+    def __init__(self, size: int, min_samples: int = 20) -> None:
+        self.min_samples = min_samples
+        self._samples: Deque[float] = deque(maxlen=max(size, 1))
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """The ``q`` quantile, or None until ``min_samples`` latencies are recorded."""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+class ProviderHealth:
+    """Circuit breaker plus TTL-cached probe status for one provider.
+
+    The request path only calls ``allow()``/``record_*()``, which never touch the network.
+    Probes run from ``status()`` (at most once per TTL) or from a ``HealthMonitor`` thread.
+    """
+
+    def __init__(self, name: str, probe: Callable[[], Any]) -> None:
+        self.name = name
+        self._probe = probe
+        self.ttl = settings.health_ttl
+        self.failure_threshold = settings.breaker_failures
+        self.base_backoff = settings.breaker_backoff
+        self.max_backoff = settings.breaker_max_backoff
+        self.state = CLOSED
+        self.failures = 0
+        self.last_error = ""
+        self._backoff = self.base_backoff
+        self._open_until = 0.0
+        self._trial_in_flight = False
+        self._status: Any = None
+        self._status_at = 0.0
+        self._lock = threading.Lock()
+        # Time to first token of recent requests; drives the hedge delay in LLMRouter.
+        self.latency = LatencyWindow(settings.latency_window)
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() >= self._open_until:
+                self.state = HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == HALF_OPEN and not self._trial_in_flight:
+                # Let exactly one request through to test the provider.
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def ready(self) -> bool:
+        """Whether ``allow()`` would let a request through now, without claiming the trial."""
+        with self._lock:
+            if self.state == OPEN:
+                return time.monotonic() >= self._open_until
+            return self.state == CLOSED or not self._trial_in_flight
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != CLOSED:
+                logger.info("%s recovered; closing circuit", self.name)
+            self.state = CLOSED
+            self.failures = 0
+            self._backoff = self.base_backoff
+            self._trial_in_flight = False
+
+    def release_trial(self) -> None:
+        """Give back a half-open trial whose request was cancelled before it had an outcome."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self, detail: str) -> None:
+        with self._lock:
+            self.failures += 1
+            self.last_error = detail
+            if self.state == HALF_OPEN:
+                # Failed trial: reopen with a longer backoff.
+                self._backoff = min(self._backoff * 2, self.max_backoff)
+                self._open(detail)
+            elif self.state == CLOSED and self.failures >= self.failure_threshold:
+                self._open(detail)
+
+    def _open(self, detail: str) -> None:
+        self.state = OPEN
+        self._trial_in_flight = False
+        self._open_until = time.monotonic() + self._backoff
+        logger.warning("%s circuit open for %.0fs: %s", self.name, self._backoff, detail)
+
+    def check(self) -> Any:
+        """Run the probe now and feed the result (a ProviderStatus) into the breaker."""
+        with tracing.span("provider.probe", provider=self.name) as span:
+            status = self._probe()
+            span.set(available=status.available)
+        with self._lock:
+            self._status = status
+            self._status_at = time.monotonic()
+        if status.available:
+            self.record_success()
+        else:
+            self.record_failure(status.detail)
+        return status
+
+    def status(self) -> Any:
+        with self._lock:
+            fresh = self._status is not None and time.monotonic() - self._status_at < self.ttl
+            cached = self._status
+        return cached if fresh else self.check()
+
+
+class HealthMonitor:
+    """Optional daemon thread that probes providers in the background."""
+
+    def __init__(self, healths: List[ProviderHealth], interval: float) -> None:
+        self.healths = healths
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None or self.interval <= 0:
+            return
+        self._thread = threading.Thread(target=self._run, name="provider-health", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            for health in self.healths:
+                try:
+                    health.check()
+                except Exception:  # pylint: disable=broad-except
+                    logger.exception("Health check for %s failed", health.name)
@@ -0,0 +1,24 @@
+"""Shared HTTP connection pools.
+
+Every Ollama provider talks to the same host, so they share one keep-alive pool instead
+of opening a client each.
+"""
+from functools import lru_cache
+
+import httpx
+from ollama import Client as OllamaClient
+
+from config.settings import settings
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.http_pool_size,
+        max_keepalive_connections=settings.http_pool_size,
+        keepalive_expiry=60,
+    )
+
+
+@lru_cache(maxsize=None)
+def ollama_client(host: str) -> OllamaClient:
+    return OllamaClient(host=host, limits=_limits())
@@ -2,8 +2,10 @@ import streamlit as st
 from pathlib import Path
 
 from config.settings import settings
-from rag.ingest import SUPPORTED_EXTS, ingest_file
-from services.resources import get_store
+from rag.ingest import SUPPORTED_EXTS
+from rag.pipeline import FileResult, ingest_files
+from rag.vector_store import VectorStore
+from services.resources import clear_resources, get_store
 
 st.set_page_config(page_title="Ingest Documents")
 
@@ -12,14 +14,13 @@ if "session_reset_done" not in st.session_state:
     if settings.ingest_data_dir.exists():
         for f in settings.ingest_data_dir.glob("*"):
             f.unlink()
-    index_file = Path(settings.vector_store_path)
-    meta_file = index_file.with_suffix(".meta.json")
-    for f in [index_file, meta_file]:
-        if f.exists():
-            f.unlink()
+    # A shared index service serves every replica and user, so a new session must not wipe it.
+    if not settings.index_service_url:
+        for f in VectorStore.persisted_files(Path(settings.vector_store_path)):
+            if f.exists():
+                f.unlink()
     # drop cached resources so a fresh VectorStore is created
-    if hasattr(st, "cache_resource"):
-        st.cache_resource.clear()
+    clear_resources()
     st.session_state["session_reset_done"] = True
 
 store = get_store()
@@ -128,13 +129,30 @@ if uploaded_files and st.button("Ingest now"):
     settings.ingest_data_dir.mkdir(parents=True, exist_ok=True)
     total_chunks = 0
     try:
+        file_paths = []
         for uploaded in uploaded_files:
             file_path = settings.ingest_data_dir / uploaded.name
             file_path.write_bytes(uploaded.getvalue())
-            chunks = ingest_file(file_path, store)
-            total_chunks += chunks
-            st.success(f"Ingested {uploaded.name} ({chunks} chunks)")
-            st.session_state["session_uploads"].append(uploaded.name)
+            file_paths.append(file_path)
+        progress_bar = st.progress(0.0, text="Ingesting...")
+
+        def on_file_done(result: FileResult, done: int, total: int) -> None:
+            progress_bar.progress(done / total, text=f"Processed {done}/{total} files")
+            if not result.ok:
+                st.error(f"Failed to ingest {result.path.name}: {result.error}")
+
+        results = ingest_files(file_paths, store, progress=on_file_done)
+        # Only report success once ingest_files has persisted the index.
+        for result in results:
+            if result.ok and result.unchanged:
+                st.info(f"{result.path.name} is already ingested and unchanged")
+            elif result.ok:
+                st.success(
+                    f"Ingested {result.path.name} ({result.chunks} new, {result.kept} unchanged, "
+                    f"{result.removed} removed chunks)"
+                )
+                st.session_state["session_uploads"].append(result.path.name)
+        total_chunks = sum(result.chunks for result in results)
         st.info(f"Total chunks added: {total_chunks}")
     except Exception as exc:  # pylint: disable=broad-except
         st.error(
@@ -150,12 +168,11 @@ if st.button("Reload index"):
     if hasattr(store, "reload"):
         store.reload()
     else:  # fallback if cached instance lacks reload (after code update)
-        from rag.vector_store import VectorStore
         store = VectorStore(settings.vector_store_path)
     st.rerun()
 
 if store.metadata:
-    sources = sorted({m.get("source", "") for m in store.metadata if m.get("source")})
+    sources = sorted(name for name in store.sources if name)
     for name in sources:
         col1, col2 = st.columns([4, 1])
         with col1:
@@ -166,7 +183,6 @@ if store.metadata:
                     removed = store.remove_source(name)
                 else:
                     # fallback to fresh instance if cached store lacks method
-                    from rag.vector_store import VectorStore
                     fresh = VectorStore(settings.vector_store_path)
                     removed = fresh.remove_source(name)
                     # swap the cached instance reference
@@ -190,17 +206,22 @@ if st.session_state["session_uploads"]:
 else:
     st.info("No uploads this session.")
 
-if st.button("Clear session uploads and index"):
+if settings.index_service_url:
+    # The shared index serves every replica and user: only undo what this session uploaded.
+    if st.button("Remove this session's uploads"):
+        for name in st.session_state["session_uploads"]:
+            store.remove_source(name)
+            file_on_disk = settings.ingest_data_dir / name
+            if file_on_disk.exists():
+                file_on_disk.unlink()
+        st.session_state["session_uploads"] = []
+        st.success("Removed this session's uploads from the index.")
+        st.rerun()
+elif st.button("Clear session uploads and index"):
     if settings.ingest_data_dir.exists():
         for f in settings.ingest_data_dir.glob("*"):
             f.unlink()
-    index_file = Path(settings.vector_store_path)
-    meta_file = index_file.with_suffix(".meta.json")
-    for f in [index_file, meta_file]:
-        if f.exists():
-            f.unlink()
-    from rag.vector_store import VectorStore
-    store = VectorStore(settings.vector_store_path)
+    store.clear()
     st.session_state["session_uploads"] = []
     st.success("Cleared uploads and index for this session.")
     st.rerun()
@@ -0,0 +1,113 @@
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"\S+\s*|\s+")
+
+
+@dataclass
+class CachedAnswer:
+    question: str
+    vector: np.ndarray
+    answer: str
+    citations: List[Dict]
+    sources: Set[str] = field(default_factory=set)
+    created: float = field(default_factory=time.monotonic)
+
+
+def replay_stream(answer: str) -> Iterator[str]:
+    """Yield a cached answer word by word so it still renders through st.write_stream."""
+    for match in _TOKEN_RE.finditer(answer):
+        yield match.group(0)
+
+
+class AnswerCache:
+    """Semantic cache of grounded answers keyed by normalized query embeddings.
+
+    A lookup hits when the cosine similarity to a cached question is at least
+    ``threshold``. Entries expire after ``ttl`` seconds, the least recently used entry is
+    evicted beyond ``max_entries``, and ``invalidate_sources`` drops every answer citing a
+    changed source.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, threshold: float) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[int, CachedAnswer]" = OrderedDict()
+        self._next_key = 0
+        self._matrix: Optional[np.ndarray] = None
+        self._keys: List[int] = []
+        self._lock = threading.Lock()
+
+    def _expire(self) -> None:
+        cutoff = time.monotonic() - self.ttl
+        expired = [key for key, entry in self._entries.items() if entry.created < cutoff]
+        for key in expired:
+            del self._entries[key]
+        if expired:
+            self._matrix = None
+
+    def lookup(self, vector: np.ndarray) -> Optional[CachedAnswer]:
+        with self._lock:
+            self._expire()
+            if not self._entries:
+                self.misses += 1
+                return None
+            if self._matrix is None:
+                self._keys = list(self._entries.keys())
+                self._matrix = np.vstack([self._entries[key].vector for key in self._keys])
+            sims = self._matrix @ vector
+            best = int(np.argmax(sims))
+            if sims[best] < self.threshold:
+                self.misses += 1
+                return None
+            key = self._keys[best]
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+
+    def put(self, question: str, vector: np.ndarray, answer: str, citations: List[Dict]) -> None:
+        sources = {cite.get("source") for cite in citations if cite.get("source")}
+        with self._lock:
+            self._entries[self._next_key] = CachedAnswer(question, vector, answer, citations, sources)
+            self._next_key += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._matrix = None
+
+    def invalidate_sources(self, sources: Iterable[str]) -> int:
+        changed = set(sources)
+        with self._lock:
+            stale = [key for key, entry in self._entries.items() if entry.sources & changed]
+            for key in stale:
+                del self._entries[key]
+            if stale:
+                self._matrix = None
+        if stale:
+            logger.info("Invalidated %d cached answers citing %s", len(stale), sorted(changed))
+        return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
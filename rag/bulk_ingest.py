@@ -0,0 +1,165 @@
+"""Headless bulk ingestion of a directory tree.
+
+Usage: python -m rag.bulk_ingest DATA_DIR [--workers N] [--prune]
+
+Files whose size and mtime (or, failing that, content hash) match the checkpoint manifest
+and are still in the store are skipped, so an interrupted run resumes where it stopped and
+nightly syncs only touch changed documents. Changed documents are diffed against their stored chunks, so only
+edited passages are re-embedded.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from config.logging_config import setup_logging
+from config.settings import settings
+from rag.ingest import SUPPORTED_EXTS, file_sha256
+from rag.pipeline import FileResult, ingest_files
+from rag.vector_store import VectorStore
+
+logger = logging.getLogger(__name__)
+
+
+def load_manifest(path: Path) -> Dict[str, Dict]:
+    if not path.exists():
+        return {}
+    with path.open() as f:
+        return json.load(f)
+
+
+def save_manifest(path: Path, manifest: Dict[str, Dict]) -> None:
+    tmp_path = path.with_name(path.name + ".tmp")
+    with tmp_path.open("w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def find_documents(root: Path) -> List[Path]:
+    return sorted(p for p in root.rglob("*") if p.is_file() and p.suffix.lower() in SUPPORTED_EXTS)
+
+
+def plan(root: Path, manifest: Dict[str, Dict], store: VectorStore) -> Dict[str, List]:
+    """Split the tree into files to ingest and files that are unchanged since the last run.
+
+    A manifest entry only counts while the store still holds that version of the document,
+    so a wiped or cleared store is re-ingested in full.
+    """
+    todo: List[Dict] = []
+    unchanged: List[str] = []
+    for path in find_documents(root):
+        source = path.relative_to(root).as_posix()
+        stat = path.stat()
+        entry = manifest.get(source)
+        if entry and store.source_hash(source) != entry["sha256"]:
+            entry = None
+        if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+            unchanged.append(source)
+            continue
+        sha256 = file_sha256(path)
+        if entry and entry["sha256"] == sha256:
+            # Touched but identical: refresh the stat fields, no re-ingest.
+            entry.update(size=stat.st_size, mtime=stat.st_mtime)
+            unchanged.append(source)
+            continue
+        todo.append(
+            {"path": path, "source": source, "sha256": sha256, "size": stat.st_size, "mtime": stat.st_mtime}
+        )
+    return {"todo": todo, "unchanged": unchanged}
+
+
+def _percentiles_ms(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {}
+    values = np.asarray(samples) * 1000
+    return {f"p{q}": round(float(np.percentile(values, q)), 1) for q in (50, 95, 99)}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Bulk-ingest a directory of PDF/DOCX files.")
+    parser.add_argument("root", type=Path, help="Directory to walk")
+    parser.add_argument("--store", type=Path, default=settings.vector_store_path, help="FAISS index path")
+    parser.add_argument("--manifest", type=Path, help="Checkpoint manifest (default: next to the index)")
+    parser.add_argument("--workers", type=int, default=settings.ingest_workers, help="Extraction processes")
+    parser.add_argument("--checkpoint-every", type=int, default=25, help="Persist + checkpoint every N files")
+    parser.add_argument("--prune", action="store_true", help="Remove sources whose files no longer exist")
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    root = args.root.resolve()
+    manifest_path = args.manifest or args.store.with_name("ingest_manifest.json")
+    manifest = load_manifest(manifest_path)
+    store = VectorStore(args.store)
+
+    started = time.perf_counter()
+    work = plan(root, manifest, store)
+    todo = work["todo"]
+    print(f"{len(todo)} files to ingest, {len(work['unchanged'])} unchanged", flush=True)
+
+    if args.prune:
+        present = {p.relative_to(root).as_posix() for p in find_documents(root)}
+        for source in sorted(set(manifest) - present):
+            removed = store.remove_source(source)
+            del manifest[source]
+            print(f"Pruned {source} ({removed} chunks)", flush=True)
+        save_manifest(manifest_path, manifest)
+
+    by_source = {item["source"]: item for item in todo}
+
+    def on_file_done(result: FileResult, done: int, total: int) -> None:
+        if result.ok:
+            item = by_source[result.source]
+            manifest[result.source] = {
+                "sha256": item["sha256"],
+                "size": item["size"],
+                "mtime": item["mtime"],
+                "chunks": result.chunks + result.kept,
+            }
+            save_manifest(manifest_path, manifest)
+        if not result.ok:
+            status = f"FAILED: {result.error}"
+        elif result.unchanged:
+            status = "unchanged"
+        else:
+            status = f"{result.chunks} new, {result.kept} unchanged, {result.removed} removed chunks"
+        print(f"[{done}/{total}] {result.source}: {status}", flush=True)
+
+    results = ingest_files(
+        [item["path"] for item in todo],
+        store,
+        progress=on_file_done,
+        workers=args.workers,
+        sources=[item["source"] for item in todo],
+        checkpoint_every=args.checkpoint_every,
+    )
+    save_manifest(manifest_path, manifest)
+
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    ok = [r for r in results if r.ok]
+    chunks = sum(r.chunks for r in ok)
+    stats = {
+        "files_ingested": len(ok),
+        "files_failed": len(results) - len(ok),
+        "files_unchanged": len(work["unchanged"]) + sum(r.unchanged for r in ok),
+        "chunks": chunks,
+        "chunks_kept": sum(r.kept for r in ok),
+        "chunks_removed": sum(r.removed for r in ok),
+        "seconds": round(elapsed, 2),
+        "files_per_s": round(len(ok) / elapsed, 2),
+        "chunks_per_s": round(chunks / elapsed, 1),
+        "extract_ms": _percentiles_ms([r.extract_seconds for r in ok]),
+        "embed_batch_ms": _percentiles_ms([s for r in results for s in r.embed_seconds]),
+        "embed_cache": store.embedder.cache_stats(),
+    }
+    print(json.dumps(stats, indent=2))
+    return 1 if stats["files_failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
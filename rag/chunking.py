@@ -0,0 +1,217 @@
+import re
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from config.settings import settings
+
+# Word runs and single punctuation marks: a cheap, dependency-free stand-in for the
+# embedding models' subword tokenizers (English prose averages within ~20% of it).
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[]?[A-Z0-9])|\n(?=\s*(?:[-•*]|\d+[.)])\s)")
+_LIST_ITEM_RE = re.compile(r"^(?:[-•*]|\d+[.)])\s")
+_NUMBERED_HEADING_RE = re.compile(r"^(?:\d+(?:\.\d+)*\.?|[IVXL]+\.|(?:section|article|part|chapter)\s+\w+)\s+\S", re.I)
+
+# Context windows of common embedding models, in tokens (Ollama's default num_ctx for the local ones).
+EMBED_CONTEXT_TOKENS = {
+    "nomic-embed-text": 2048,
+    "mxbai-embed-large": 512,
+    "all-minilm": 256,
+    "snowflake-arctic-embed": 512,
+    "bge-m3": 8192,
+    "text-embedding-004": 2048,
+    "embedding-001": 2048,
+}
+
+
+class Block(NamedTuple):
+    """One extracted paragraph. DOCX has no fixed pages, so its blocks have ``page=None``.
+
+    ``heading`` comes from DOCX paragraph styles, or from ``pdf_paragraphs`` for PDF text.
+    """
+
+    page: Optional[int]
+    paragraph: int
+    text: str
+    heading: bool = False
+
+
+@dataclass
+class Chunk:
+    text: str
+    page: Optional[int]
+    paragraph: int
+    section: Optional[str]
+    tokens: int
+
+
+def count_tokens(text: str) -> int:
+    return len(_TOKEN_RE.findall(text))
+
+
+def _context_tokens(model: str) -> Optional[int]:
+    name = model.split("/")[-1].split(":")[0]
+    return EMBED_CONTEXT_TOKENS.get(name)
+
+
+def token_budget() -> int:
+    """CHUNK_MAX_TOKENS, capped below the smallest context of the configured embedders."""
+    contexts = [
+        ctx for ctx in (_context_tokens(settings.ollama_embed_model), _context_tokens(settings.gemini_embed_model)) if ctx
+    ]
+    budget = settings.chunk_max_tokens
+    if contexts:
+        # Token counts are approximate; keep 20% headroom so chunks are never truncated.
+        budget = min(budget, int(min(contexts) * 0.8))
+    return max(budget, 32)
+
+
+def looks_like_heading(text: str) -> bool:
+    """Heuristic for PDF text: a short single line that is numbered, ALL CAPS or Title Case."""
+    text = text.strip()
+    if "\n" in text or len(text) > 80 or text[-1] in ".,;":
+        return False
+    words = text.split()
+    if len(words) > 12:
+        return False
+    if _NUMBERED_HEADING_RE.match(text):
+        return True
+    letters = [ch for ch in text if ch.isalpha()]
+    if len(letters) >= 3 and all(ch.isupper() for ch in letters):
+        return True
+    capitalized = sum(1 for word in words if word[0].isupper() or not word[0].isalpha())
+    return len(words) >= 2 and capitalized / len(words) >= 0.75
+
+
+def pdf_paragraphs(text: str) -> Iterator[Tuple[str, bool]]:
+    """Regroup a PDF page's text into ``(paragraph, is_heading)`` pairs.
+
+    pypdf returns one line per visual line, usually without blank lines between
+    paragraphs. A line is taken as a heading only when it looks like one and follows a
+    blank line, another heading or a finished sentence, so wrapped body lines stay put.
+    List items start a new paragraph; every other line continues the current one.
+    """
+    lines: List[str] = []
+    boundary = True
+    for raw in text.splitlines():
+        line = raw.strip()
+        if not line:
+            if lines:
+                yield "\n".join(lines), False
+                lines = []
+            boundary = True
+            continue
+        if boundary and looks_like_heading(line):
+            if lines:
+                yield "\n".join(lines), False
+                lines = []
+            yield line, True
+            continue
+        if lines and _LIST_ITEM_RE.match(line):
+            yield "\n".join(lines), False
+            lines = []
+        lines.append(line)
+        boundary = line[-1] in ".!?:"
+    if lines:
+        yield "\n".join(lines), False
+
+
+def split_sentences(text: str) -> List[str]:
+    return [part.strip() for part in _SENTENCE_RE.split(text) if part.strip()]
+
+
+def _clean(text: str) -> str:
+    return " ".join(text.split())
+
+
+class _Buffer:
+    def __init__(self) -> None:
+        self.parts: List[str] = []
+        self.tokens = 0
+        self.has_body = False
+        self.page: Optional[int] = None
+        self.paragraph = 0
+
+    def add(self, block: Block, text: str, tokens: int, body: bool) -> None:
+        if not self.parts:
+            self.page, self.paragraph = block.page, block.paragraph
+        self.parts.append(text)
+        self.tokens += tokens
+        self.has_body = self.has_body or body
+
+    def emit(self, section: Optional[str]) -> Chunk:
+        chunk = Chunk("\n\n".join(self.parts), self.page, self.paragraph, section, self.tokens)
+        self.parts, self.tokens, self.has_body = [], 0, False
+        return chunk
+
+
+class Chunker:
+    """Token-budgeted chunking that follows document structure.
+
+    Adjacent paragraphs on the same page are merged until the next one would exceed
+    ``max_tokens``; a heading always starts a new chunk and stays attached to the text
+    below it. Paragraphs over budget are split at sentence boundaries with roughly
+    ``overlap_tokens`` of trailing sentences repeated, and only a single sentence over
+    budget is cut mid-sentence. Works on a stream of blocks, holding one chunk at a time.
+    """
+
+    def __init__(self, max_tokens: Optional[int] = None, overlap_tokens: Optional[int] = None) -> None:
+        self.max_tokens = max_tokens or token_budget()
+        overlap = settings.chunk_overlap_tokens if overlap_tokens is None else overlap_tokens
+        self.overlap_tokens = min(overlap, self.max_tokens // 4)
+
+    def chunks(self, blocks: Iterable[Block]) -> Iterator[Chunk]:
+        buffer = _Buffer()
+        section: Optional[str] = None
+        for block in blocks:
+            text = _clean(block.text)
+            if not text:
+                continue
+            if buffer.parts and (block.page != buffer.page or (block.heading and buffer.has_body)):
+                yield buffer.emit(section)
+            tokens = count_tokens(text)
+            if block.heading:
+                section = text
+                buffer.add(block, text, tokens, body=False)
+                continue
+            if buffer.tokens + tokens > self.max_tokens and buffer.has_body:
+                yield buffer.emit(section)
+            if buffer.tokens + tokens <= self.max_tokens:
+                buffer.add(block, text, tokens, body=True)
+                continue
+            # Over budget on its own: the first window carries any pending heading.
+            budget = max(self.max_tokens - buffer.tokens, self.max_tokens // 2)
+            for window, window_tokens in self._windows(block.text, budget):
+                buffer.add(block, window, window_tokens, body=True)
+                yield buffer.emit(section)
+        if buffer.parts:
+            yield buffer.emit(section)
+
+    def _windows(self, text: str, budget: int) -> Iterator[Tuple[str, int]]:
+        pieces: List[str] = []
+        for sentence in split_sentences(text):
+            pieces.extend(self._hard_split(_clean(sentence), budget))
+        counts = np.fromiter((count_tokens(piece) for piece in pieces), dtype=np.int64, count=len(pieces))
+        overlap = min(self.overlap_tokens, budget // 4)
+        start = 0
+        while start < len(pieces):
+            # Greedily take as many pieces as fit, then step back over the overlap.
+            cumulative = np.cumsum(counts[start:])
+            end = start + max(int(np.searchsorted(cumulative, budget, side="right")), 1)
+            yield " ".join(pieces[start:end]), int(counts[start:end].sum())
+            if end >= len(pieces):
+                return
+            tail = np.cumsum(counts[start:end][::-1])
+            start = max(end - int(np.searchsorted(tail, overlap, side="right")), start + 1)
+
+    def _hard_split(self, sentence: str, budget: int) -> List[str]:
+        spans = [match.span() for match in _TOKEN_RE.finditer(sentence)]
+        if len(spans) <= budget:
+            return [sentence]
+        step = max(budget - min(self.overlap_tokens, budget // 4), 1)
+        return [
+            sentence[spans[start][0]:spans[min(start + budget, len(spans)) - 1][1]]
+            for start in range(0, len(spans), step)
+            if start == 0 or start + budget - step < len(spans)
+        ]
@@ -0,0 +1,138 @@
+import logging
+import math
+import time
+from typing import Dict
+
+import faiss
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+INDEX_KINDS = ("flat", "ivf", "hnsw", "ivfpq")
+# IVF k-means wants roughly this many training points per list to produce stable centroids.
+_MIN_POINTS_PER_LIST = 39
+# Each 8-bit PQ sub-quantizer learns 2**_PQ_BITS centroids, so it needs at least that many points.
+_PQ_BITS = 8
+# An IVF index is retrained once the corpus calls for this many times the lists it was trained with.
+RETRAIN_FACTOR = 4
+
+
+def choose_kind(configured: str, ann_kind: str, n_vectors: int, threshold: int) -> str:
+    """Resolve the index kind for a corpus of ``n_vectors`` chunks."""
+    if configured != "auto":
+        return configured
+    return ann_kind if n_vectors >= threshold else "flat"
+
+
+def _nlist_for(n_vectors: int) -> int:
+    nlist = int(4 * math.sqrt(max(n_vectors, 1)))
+    return max(1, min(nlist, n_vectors // _MIN_POINTS_PER_LIST))
+
+
+def _pq_subquantizers(dim: int) -> int:
+    for m in (64, 48, 32, 24, 16, 12, 8, 4, 2):
+        if dim % m == 0 and dim // m >= 4:
+            return m
+    return 1
+
+
+def can_build(kind: str, n_vectors: int) -> bool:
+    """Whether ``n_vectors`` is enough to train an index of ``kind``."""
+    if kind in ("flat", "hnsw"):
+        return True
+    if kind == "ivfpq":
+        return n_vectors >= max(_MIN_POINTS_PER_LIST * 2, 2 ** _PQ_BITS)
+    return n_vectors >= _MIN_POINTS_PER_LIST * 2
+
+
+def needs_retrain(index: faiss.Index, n_vectors: int) -> bool:
+    """Whether an IVF index trained on a smaller corpus now has too few lists for ``n_vectors``."""
+    ivf = faiss.try_extract_index_ivf(index)
+    return ivf is not None and _nlist_for(n_vectors) >= RETRAIN_FACTOR * ivf.nlist
+
+
+def build_index(kind: str, dim: int, training_vectors: np.ndarray) -> faiss.Index:
+    """Build an empty, trained inner-product index that accepts ``add_with_ids``.
+
+    IVF variants need enough training vectors; when there are too few the flat index is
+    returned instead so small corpora never end up with a badly trained ANN index.
+    """
+    if kind not in INDEX_KINDS:
+        raise ValueError(f"Unknown index kind: {kind}")
+    if kind == "flat":
+        return faiss.IndexIDMap2(faiss.IndexFlatIP(dim))
+    if kind == "hnsw":
+        return faiss.IndexIDMap2(faiss.IndexHNSWFlat(dim, 32, faiss.METRIC_INNER_PRODUCT))
+    n_vectors = len(training_vectors)
+    if not can_build(kind, n_vectors):
+        logger.warning("Only %d vectors available; using flat index instead of %s", n_vectors, kind)
+        return build_index("flat", dim, training_vectors)
+    nlist = _nlist_for(n_vectors)
+    quantizer = faiss.IndexFlatIP(dim)
+    if kind == "ivf":
+        index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+    else:
+        index = faiss.IndexIVFPQ(quantizer, dim, nlist, _pq_subquantizers(dim), _PQ_BITS, faiss.METRIC_INNER_PRODUCT)
+    logger.info("Training %s index (nlist=%d) on %d vectors", kind, nlist, n_vectors)
+    index.train(training_vectors)
+    # IVF keeps caller-provided IDs natively; the hashtable lets us reconstruct and remove by ID.
+    index.set_direct_map_type(faiss.DirectMap.Hashtable)
+    return index
+
+
+def index_kind(index: faiss.Index) -> str:
+    if faiss.try_extract_index_ivf(index) is not None:
+        return "ivfpq" if isinstance(faiss.downcast_index(index), faiss.IndexIVFPQ) else "ivf"
+    inner = faiss.downcast_index(index.index) if hasattr(index, "index") else index
+    return "hnsw" if hasattr(inner, "hnsw") else "flat"
+
+
+def apply_search_params(index: faiss.Index, nprobe: int, ef_search: int) -> None:
+    """Set query-time accuracy knobs (IVF nprobe, HNSW efSearch) on ``index``."""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = nprobe
+        return
+    inner = faiss.downcast_index(index.index) if hasattr(index, "index") else index
+    if hasattr(inner, "hnsw"):
+        inner.hnsw.efSearch = ef_search
+
+
+def supports_removal(index: faiss.Index) -> bool:
+    # HNSW graphs cannot drop nodes; those indexes rely on tombstones plus compaction.
+    return index_kind(index) != "hnsw"
+
+
+def stored_ids(index: faiss.Index) -> np.ndarray:
+    """All vector IDs held by ``index``, including tombstoned ones."""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is None:
+        return faiss.vector_to_array(index.id_map).astype("int64")
+    invlists = ivf.invlists
+    parts = [
+        faiss.rev_swig_ptr(invlists.get_ids(lst), invlists.list_size(lst)).copy()
+        for lst in range(ivf.nlist)
+        if invlists.list_size(lst)
+    ]
+    return np.concatenate(parts).astype("int64") if parts else np.zeros(0, dtype="int64")
+
+
+def recall_at_k(index: faiss.Index, vectors: np.ndarray, ids: np.ndarray, queries: np.ndarray, k: int) -> Dict:
+    """Compare ``index`` against an exact flat search over ``vectors``/``ids``."""
+    exact = faiss.IndexIDMap2(faiss.IndexFlatIP(vectors.shape[1]))
+    exact.add_with_ids(vectors, ids)
+    start = time.perf_counter()
+    _, exact_ids = exact.search(queries, k)
+    flat_ms = (time.perf_counter() - start) * 1000 / len(queries)
+    start = time.perf_counter()
+    _, ann_ids = index.search(queries, k)
+    ann_ms = (time.perf_counter() - start) * 1000 / len(queries)
+    overlap = [len(set(a[a >= 0]) & set(e[e >= 0])) / k for a, e in zip(ann_ids, exact_ids)]
+    return {
+        "kind": index_kind(index),
+        "k": k,
+        "queries": len(queries),
+        f"recall@{k}": float(np.mean(overlap)),
+        "ann_ms_per_query": ann_ms,
+        "flat_ms_per_query": flat_ms,
+    }
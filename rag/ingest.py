@@ -1,11 +1,14 @@
+import hashlib
 import logging
-import uuid
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, Iterator, List, Optional, Tuple
 
 import docx
 from pypdf import PdfReader
 
+from config.settings import settings
+from llm.embedding_cache import text_hash
+from rag.chunking import Block, Chunker, pdf_paragraphs
 from rag.vector_store import VectorStore
 
 logger = logging.getLogger(__name__)
@@ -13,7 +16,16 @@ logger = logging.getLogger(__name__)
 SUPPORTED_EXTS = {".pdf", ".docx"}
 
 
-def extract_text(file_path: Path) -> List[str]:
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def extract_text(file_path: Path) -> Iterator[Block]:
+    """Lazily yield paragraph blocks so only one page is held in memory at a time."""
     suffix = file_path.suffix.lower()
     if suffix == ".pdf":
         return _extract_pdf(file_path)
@@ -22,29 +34,24 @@ def extract_text(file_path: Path) -> List[str]:
     raise ValueError(f"Unsupported file type: {suffix}")
 
 
-def _extract_pdf(file_path: Path) -> List[str]:
+def _extract_pdf(file_path: Path) -> Iterator[Block]:
     reader = PdfReader(str(file_path))
-    pages: List[str] = []
-    for page in reader.pages:
+    for page_no, page in enumerate(reader.pages, start=1):
         text = page.extract_text() or ""
-        if not text.strip():
-            continue
-        # Prefer paragraph-level splits to keep chunks tighter
-        paragraphs = [p.strip() for p in text.split("\n\n") if p.strip()]
-        if paragraphs:
-            pages.extend(paragraphs)
-        else:
-            pages.append(text.strip())
-    return pages
+        for para_no, (paragraph, heading) in enumerate(pdf_paragraphs(text), start=1):
+            yield Block(page_no, para_no, paragraph, heading)
 
 
-def _extract_docx(file_path: Path) -> List[str]:
+def _extract_docx(file_path: Path) -> Iterator[Block]:
     document = docx.Document(str(file_path))
-    paragraphs = [para.text for para in document.paragraphs if para.text.strip()]
-    return paragraphs
+    paragraphs = (para for para in document.paragraphs if para.text.strip())
+    for para_no, para in enumerate(paragraphs, start=1):
+        style = para.style.name if para.style is not None else ""
+        yield Block(None, para_no, para.text, heading=style.startswith("Heading") or style == "Title")
 
 
 def chunk_text(text: str, max_words: int = 220, overlap: int = 30) -> List[str]:
+    """Fixed word windows; superseded by ``rag.chunking.Chunker`` and kept as a baseline."""
     words = text.split()
     chunks: List[str] = []
     step = max(max_words - overlap, 1)
@@ -57,29 +64,87 @@ def chunk_text(text: str, max_words: int = 220, overlap: int = 30) -> List[str]:
     return chunks
 
 
-def ingest_file(file_path: Path, store: VectorStore) -> int:
+def iter_chunks(
+    file_path: Path,
+    source: Optional[str] = None,
+    doc_hash: Optional[str] = None,
+    chunker: Optional[Chunker] = None,
+) -> Iterator[Dict]:
+    """Lazily chunk one file into chunk metadata (text included, no embedding).
+
+    ``source`` defaults to the file name; bulk ingestion passes a relative path instead so
+    same-named files in different folders stay distinct. The doc_id is the file's content
+    hash (``doc_hash`` if the caller already computed it) and every chunk carries the hash
+    of its normalized text; repeated chunks within the document are kept once.
+    """
     if file_path.suffix.lower() not in SUPPORTED_EXTS:
         raise ValueError(f"Unsupported file: {file_path}")
+    doc_id = doc_hash or file_sha256(file_path)
+    chunker = chunker or Chunker()
+    seen = set()
+    page, position = None, 0
+    for chunk in chunker.chunks(extract_text(file_path)):
+        chunk_hash = text_hash(chunk.text).hex()
+        if chunk_hash in seen:
+            continue
+        seen.add(chunk_hash)
+        position = position + 1 if chunk.page == page else 1
+        page = chunk.page
+        yield {
+            "doc_id": doc_id,
+            "source": source or file_path.name,
+            "page": chunk.page,
+            "paragraph": chunk.paragraph,
+            "section": chunk.section,
+            "chunk_id": f"{chunk.page}-{position}" if chunk.page is not None else str(position),
+            "chunk_hash": chunk_hash,
+            "text": chunk.text,
+        }
+
+
+def iter_chunk_batches(
+    file_path: Path, batch_size: int, source: Optional[str] = None, doc_hash: Optional[str] = None
+) -> Iterator[List[Dict]]:
+    batch: List[Dict] = []
+    for meta in iter_chunks(file_path, source, doc_hash):
+        batch.append(meta)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def build_chunks(
+    file_path: Path, source: Optional[str] = None, doc_hash: Optional[str] = None
+) -> Tuple[List[str], List[Dict]]:
+    """Materialized ``iter_chunks``: chunk texts plus their metadata."""
+    metadatas = list(iter_chunks(file_path, source, doc_hash))
+    return [meta["text"] for meta in metadatas], metadatas
+
+
+def ingest_file(file_path: Path, store: VectorStore) -> int:
+    """Ingest or re-ingest one file; returns the number of newly embedded chunks.
+
+    Pages are extracted, chunked and embedded in fixed-size batches, so memory stays flat
+    however large the document is. An unchanged file is a no-op and a revised one only
+    embeds the chunks that changed.
+    """
     logger.info("Ingesting %s", file_path.name)
-    parts = extract_text(file_path)
-    doc_id = str(uuid.uuid4())
-    total_chunks = 0
-    for idx, part in enumerate(parts):
-        chunks = chunk_text(part)
-        metadatas: List[Dict] = []
-        chunk_texts: List[str] = []
-        for c_idx, chunk in enumerate(chunks):
-            chunk_texts.append(chunk)
-            metadatas.append(
-                {
-                    "doc_id": doc_id,
-                    "source": file_path.name,
-                    "page": idx + 1,
-                    "chunk_id": f"{idx + 1}-{c_idx + 1}",
-                    "text": chunk,
-                }
-            )
-        store.add_texts(chunk_texts, metadatas)
-        total_chunks += len(chunks)
-    logger.info("Ingested %d chunks from %s", total_chunks, file_path.name)
-    return total_chunks
+    doc_hash = file_sha256(file_path)
+    if store.source_hash(file_path.name) == doc_hash:
+        logger.info("%s is unchanged; skipping", file_path.name)
+        return 0
+    batch_size = max(settings.embed_batch_size * settings.embed_concurrency, 1)
+    batches = iter_chunk_batches(file_path, batch_size, doc_hash=doc_hash)
+    counts = store.sync_source(file_path.name, doc_hash, batches)
+    if counts is None:
+        return 0
+    logger.info(
+        "Ingested %s: %d new, %d unchanged, %d removed chunks",
+        file_path.name,
+        counts["new"],
+        counts["kept"],
+        counts["removed"],
+    )
+    return counts["new"]
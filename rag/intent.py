@@ -0,0 +1,144 @@
+import logging
+import re
+import threading
+import weakref
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config.settings import settings
+from llm.embeddings import EmbeddingRouter
+
+logger = logging.getLogger(__name__)
+
+INTENT_LABELS = ("hr_policy", "non_hr", "chitchat")
+
+# Obvious small talk: the whole message is a greeting/thanks/farewell.
+_CHITCHAT_RE = re.compile(
+    r"^\s*(hi+|hello|hey+|hiya|yo|good\s+(morning|afternoon|evening|day)|how\s+are\s+you(\s+doing)?|"
+    r"how'?s\s+it\s+going|what'?s\s+up|sup|thanks?(\s+you)?(\s+so\s+much)?|thank\s+you|thx|ty|ok(ay)?|cool|"
+    r"great|nice|bye|goodbye|see\s+you|good\s+night)(\s+(there|bot|again))?\s*[!.?]*\s*$",
+    re.IGNORECASE,
+)
+# Terms that only show up in HR policy questions.
+_HR_RE = re.compile(
+    r"\b(pto|paid\s+time\s+off|leave|vacation|sick\s+(day|leave)|maternity|paternity|parental|"
+    r"bereavement|fmla|benefits?|401\s*k|pension|payroll|pay\s*(day|slip|check)|salary|bonus|"
+    r"overtime|probation|onboarding|offboarding|resign(ation)?|notice\s+period|termination|harass\w*|"
+    r"discriminat\w*|dress\s+code|code\s+of\s+conduct|remote\s+work|work\s+from\s+home|wfh|attendance|"
+    r"timesheet|reimburse\w*|travel\s+policy|performance\s+review|appraisal|hr\s+polic\w*)\b",
+    re.IGNORECASE,
+)
+
+# Seed examples for the nearest-centroid classifier (kept separate from tests/intent_eval.csv).
+INTENT_EXAMPLES: Dict[str, List[str]] = {
+    "hr_policy": [
+        "How many vacation days do I get each year?",
+        "What is the policy on working from home?",
+        "How do I request parental leave?",
+        "When are employees paid each month?",
+        "What happens if I am late to work repeatedly?",
+        "Can I carry over unused leave to next year?",
+        "Who do I report workplace harassment to?",
+        "What is the notice period if I resign?",
+        "Are contractors eligible for health benefits?",
+        "How do I submit travel expenses for reimbursement?",
+        "What is the dress code in the office?",
+        "How long is the probation period for new employees?",
+    ],
+    "chitchat": [
+        "Hi there, how are you today?",
+        "Good morning!",
+        "Thanks for the help",
+        "You are a pretty helpful bot",
+        "What's your name?",
+        "Nice to meet you",
+        "Have a great weekend",
+        "Are you a real person?",
+        "Hello again",
+        "That was useful, cheers",
+    ],
+    "non_hr": [
+        "What is the capital of France?",
+        "Write me a Python function to sort a list",
+        "Who won the football match last night?",
+        "What's the weather like tomorrow?",
+        "Recommend a good movie to watch",
+        "How do I bake sourdough bread?",
+        "Explain quantum computing simply",
+        "What is the stock price of Apple?",
+        "Translate 'good morning' into Spanish",
+        "How far is the moon from the earth?",
+    ],
+}
+
+
+class LocalIntentClassifier:
+    """Regex prefilter plus nearest-centroid classification over query embeddings.
+
+    ``predict`` returns ``(label, confidence)`` and a ``None`` label when it is not sure,
+    in which case callers fall back to the LLM classifier.
+    """
+
+    def __init__(self, embedder: EmbeddingRouter) -> None:
+        self.embedder = embedder
+        self.min_similarity = settings.intent_min_similarity
+        self.min_margin = settings.intent_min_margin
+        self._centroids: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        return vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-10)
+
+    def _get_centroids(self) -> np.ndarray:
+        with self._lock:
+            if self._centroids is None:
+                # Seed embeddings hit the persistent embedding cache after the first run.
+                centroids = [
+                    self._normalize(self.embedder.embed(INTENT_EXAMPLES[label])).mean(axis=0)
+                    for label in INTENT_LABELS
+                ]
+                self._centroids = self._normalize(np.vstack(centroids).astype("float32"))
+            return self._centroids
+
+    def predict(
+        self, question: str, embed_query: Optional[Callable[[str], Optional[np.ndarray]]] = None
+    ) -> Tuple[Optional[str], float]:
+        """Classify ``question``; pass ``store.embed_query`` so retrieval reuses the cached vector.
+
+        ``embed_query`` may return None (embedder down or too slow), leaving the question unclassified.
+        """
+        if _CHITCHAT_RE.match(question):
+            return "chitchat", 1.0
+        if _HR_RE.search(question):
+            return "hr_policy", 1.0
+        try:
+            vector = embed_query(question) if embed_query is not None else self.embedder.embed([question])
+            if vector is None:
+                return None, 0.0
+            query = self._normalize(vector)[0]
+            sims = self._get_centroids() @ query
+        except Exception:  # pylint: disable=broad-except
+            logger.exception("Local intent classification failed")
+            return None, 0.0
+        order = np.argsort(sims)[::-1]
+        best, runner_up = float(sims[order[0]]), float(sims[order[1]])
+        margin = best - runner_up
+        if best < self.min_similarity or margin < self.min_margin:
+            return None, margin
+        return INTENT_LABELS[int(order[0])], margin
+
+
+_classifiers: "weakref.WeakKeyDictionary[EmbeddingRouter, LocalIntentClassifier]" = weakref.WeakKeyDictionary()
+_classifiers_lock = threading.Lock()
+
+
+def get_local_classifier(embedder: EmbeddingRouter) -> LocalIntentClassifier:
+    """One classifier (and one set of centroids) per embedder."""
+    with _classifiers_lock:
+        classifier = _classifiers.get(embedder)
+        if classifier is None:
+            classifier = LocalIntentClassifier(embedder)
+            _classifiers[embedder] = classifier
+        return classifier
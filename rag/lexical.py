@@ -0,0 +1,51 @@
+import re
+from typing import Dict, List, Optional, Sequence
+
+# Codes like "HR-102" or "401(k)" stay together; FTS5 turns a quoted term into a phrase.
+_TERM_RE = re.compile(r"\w+(?:[-/.]\w+)*")
+_WORD_RE = re.compile(r"\w+")
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from have how i if in is it me my of on or our should "
+    "the their there this to was we what when where which who why will with you your".split()
+)
+RRF_K = 60
+
+
+def query_terms(question: str) -> List[str]:
+    seen: Dict[str, None] = {}
+    for match in _TERM_RE.finditer(question.lower()):
+        term = match.group(0)
+        if term not in STOPWORDS:
+            seen.setdefault(term, None)
+    return list(seen)
+
+
+def fts_query(question: str) -> Optional[str]:
+    """An FTS5 MATCH expression OR-ing the question's content terms, or None if it has none."""
+    terms = query_terms(question)
+    if not terms:
+        return None
+    return " OR ".join(f'"{term}"' for term in terms)
+
+
+def _stem(word: str) -> str:
+    # Crude prefix stem so "leaves"/"leave" or "reimbursement"/"reimbursed" match.
+    return word[:5]
+
+
+def term_coverage(question: str, text: str) -> float:
+    """Share of the question's content words found in ``text``, as a 0-1 relevance score."""
+    words = {_stem(word) for term in query_terms(question) for word in _WORD_RE.findall(term)}
+    if not words:
+        return 0.0
+    present = {_stem(word) for word in _WORD_RE.findall(text.lower())}
+    return len(words & present) / len(words)
+
+
+def rrf_fuse(rankings: Sequence[Sequence[int]], k: int = RRF_K) -> List[int]:
+    """Reciprocal-rank fusion of several ranked ID lists, best first."""
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, vid in enumerate(ranking):
+            scores[vid] = scores.get(vid, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.__getitem__, reverse=True)
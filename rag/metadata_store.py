@@ -0,0 +1,270 @@
+import json
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from llm.embedding_cache import SQLITE_MAX_PARAMS
+
+logger = logging.getLogger(__name__)
+
+_COLUMNS = ("doc_id", "source", "page", "chunk_id", "chunk_hash", "text")
+
+
+class MetadataStore:
+    """Chunk metadata in SQLite, keyed by FAISS vector ID.
+
+    Source names are interned in their own table and rows are only materialized for the
+    IDs a caller asks for, so opening a store costs a few milliseconds and almost no memory
+    regardless of corpus size. Writes stay in an open transaction until ``commit()``.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS sources (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+            CREATE TABLE IF NOT EXISTS chunks (
+                id INTEGER PRIMARY KEY,
+                source_id INTEGER NOT NULL REFERENCES sources(id),
+                doc_id TEXT,
+                page INTEGER,
+                chunk_id TEXT,
+                text TEXT NOT NULL,
+                extra TEXT
+            );
+            CREATE INDEX IF NOT EXISTS chunks_source ON chunks(source_id);
+            CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+            """
+        )
+        # Content hashes for incremental re-ingest; added to stores created before they existed.
+        self._add_column("sources", "doc_hash TEXT")
+        self._add_column("chunks", "chunk_hash TEXT")
+        self.has_fts = self._create_fts()
+        self._conn.commit()
+        self._count = 0
+        self.refresh()
+
+    def _create_fts(self) -> bool:
+        """BM25 index over chunk text, kept in sync with ``chunks`` by triggers.
+
+        It is an external-content FTS5 table, so the text itself is not stored twice.
+        """
+        exists = self._conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'chunks_fts'").fetchone()
+        try:
+            self._conn.executescript(
+                """
+                CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts
+                    USING fts5(text, content='chunks', content_rowid='id', tokenize='porter unicode61');
+                CREATE TRIGGER IF NOT EXISTS chunks_fts_insert AFTER INSERT ON chunks BEGIN
+                    INSERT INTO chunks_fts(rowid, text) VALUES (new.id, new.text);
+                END;
+                CREATE TRIGGER IF NOT EXISTS chunks_fts_delete AFTER DELETE ON chunks BEGIN
+                    INSERT INTO chunks_fts(chunks_fts, rowid, text) VALUES ('delete', old.id, old.text);
+                END;
+                CREATE TRIGGER IF NOT EXISTS chunks_fts_update AFTER UPDATE OF text ON chunks BEGIN
+                    INSERT INTO chunks_fts(chunks_fts, rowid, text) VALUES ('delete', old.id, old.text);
+                    INSERT INTO chunks_fts(rowid, text) VALUES (new.id, new.text);
+                END;
+                """
+            )
+        except sqlite3.OperationalError:
+            logger.warning("SQLite was built without FTS5; lexical search is disabled")
+            return False
+        if not exists:
+            # Index chunks written before the FTS table existed.
+            self._conn.execute("INSERT INTO chunks_fts(chunks_fts) VALUES ('rebuild')")
+        return True
+
+    def _add_column(self, table: str, definition: str) -> None:
+        name = definition.split()[0]
+        columns = {row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+        if name not in columns:
+            self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {definition}")
+
+    def refresh(self) -> None:
+        with self._lock:
+            self._count = self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _source_id(self, name: str) -> int:
+        row = self._conn.execute("SELECT id FROM sources WHERE name = ?", (name,)).fetchone()
+        if row:
+            return row[0]
+        return self._conn.execute("INSERT INTO sources(name) VALUES (?)", (name,)).lastrowid
+
+    def add(self, ids: Iterable[int], metadatas: List[Dict]) -> None:
+        rows = []
+        with self._lock:
+            source_ids: Dict[str, int] = {}
+            for vid, meta in zip(ids, metadatas):
+                source = meta.get("source", "")
+                if source not in source_ids:
+                    source_ids[source] = self._source_id(source)
+                extra = {key: value for key, value in meta.items() if key not in _COLUMNS}
+                rows.append(
+                    (
+                        int(vid),
+                        source_ids[source],
+                        meta.get("doc_id"),
+                        meta.get("page"),
+                        meta.get("chunk_id"),
+                        meta.get("chunk_hash"),
+                        meta.get("text", ""),
+                        json.dumps(extra) if extra else None,
+                    )
+                )
+            self._conn.executemany(
+                "INSERT INTO chunks(id, source_id, doc_id, page, chunk_id, chunk_hash, text, extra) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._count += len(rows)
+
+    def get_many(self, ids: List[int]) -> Dict[int, Dict]:
+        """Materialize the rows for ``ids``; IDs without metadata are simply absent."""
+        found: Dict[int, Dict] = {}
+        with self._lock:
+            for start in range(0, len(ids), SQLITE_MAX_PARAMS):
+                chunk = ids[start:start + SQLITE_MAX_PARAMS]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    "SELECT c.id, c.doc_id, s.name, c.page, c.chunk_id, c.chunk_hash, c.text, c.extra "
+                    f"FROM chunks c JOIN sources s ON s.id = c.source_id WHERE c.id IN ({placeholders})",
+                    chunk,
+                ).fetchall()
+                for vid, doc_id, source, page, chunk_id, chunk_hash, text, extra in rows:
+                    meta = {
+                        "doc_id": doc_id,
+                        "source": source,
+                        "page": page,
+                        "chunk_id": chunk_id,
+                        "chunk_hash": chunk_hash,
+                        "text": text,
+                    }
+                    if extra:
+                        meta.update(json.loads(extra))
+                    found[vid] = meta
+        return found
+
+    def lexical_search(self, match: str, limit: int) -> List[Tuple[int, float]]:
+        """``(id, bm25)`` for an FTS5 ``match`` expression, best first (lower bm25 is better)."""
+        if not self.has_fts:
+            return []
+        with self._lock:
+            try:
+                return self._conn.execute(
+                    "SELECT rowid, bm25(chunks_fts) AS rank FROM chunks_fts WHERE chunks_fts MATCH ? "
+                    "ORDER BY rank LIMIT ?",
+                    (match, limit),
+                ).fetchall()
+            except sqlite3.OperationalError:
+                logger.exception("Lexical search failed for %r", match)
+                return []
+
+    def all_ids(self) -> np.ndarray:
+        with self._lock:
+            rows = self._conn.execute("SELECT id FROM chunks ORDER BY id").fetchall()
+        return np.fromiter((row[0] for row in rows), dtype="int64", count=len(rows))
+
+    def sources(self) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT name FROM sources WHERE EXISTS (SELECT 1 FROM chunks WHERE source_id = sources.id) ORDER BY name"
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def ids_for_source(self, name: str) -> List[int]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT c.id FROM chunks c JOIN sources s ON s.id = c.source_id WHERE s.name = ?", (name,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def chunk_hashes(self, name: str) -> List[Tuple[int, Optional[str]]]:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT c.id, c.chunk_hash FROM chunks c JOIN sources s ON s.id = c.source_id WHERE s.name = ?",
+                (name,),
+            ).fetchall()
+
+    def update_provenance(self, rows: List[Tuple[int, Dict]]) -> None:
+        """Rewrite doc/page/chunk labels of kept chunks whose text did not change."""
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE chunks SET doc_id = ?, page = ?, chunk_id = ? WHERE id = ?",
+                [(meta.get("doc_id"), meta.get("page"), meta.get("chunk_id"), int(vid)) for vid, meta in rows],
+            )
+
+    def source_hash(self, name: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT doc_hash FROM sources WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def set_source_hash(self, name: str, doc_hash: str) -> None:
+        with self._lock:
+            self._source_id(name)
+            self._conn.execute("UPDATE sources SET doc_hash = ? WHERE name = ?", (doc_hash, name))
+
+    def remove_source(self, name: str) -> List[int]:
+        ids = self.ids_for_source(name)
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM chunks WHERE source_id = (SELECT id FROM sources WHERE name = ?)", (name,)
+            )
+            self._conn.execute("DELETE FROM sources WHERE name = ?", (name,))
+            self._count -= len(ids)
+        return ids
+
+    def delete_ids(self, ids: List[int]) -> None:
+        with self._lock:
+            for start in range(0, len(ids), SQLITE_MAX_PARAMS):
+                chunk = ids[start:start + SQLITE_MAX_PARAMS]
+                placeholders = ",".join("?" * len(chunk))
+                self._conn.execute(f"DELETE FROM chunks WHERE id IN ({placeholders})", chunk)
+            self._count -= len(ids)
+
+    def get_state(self, key: str, default: int = 0) -> int:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_state(self, **values: int) -> None:
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO state(key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                list(values.items()),
+            )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM chunks")
+            self._conn.execute("DELETE FROM sources")
+            self._conn.execute("DELETE FROM state")
+            self._count = 0
+
+    def commit(self) -> None:
+        with self._lock:
+            self._conn.commit()
+
+    def rollback(self) -> None:
+        with self._lock:
+            self._conn.rollback()
+        self.refresh()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def files_for(path: Path) -> List[Path]:
+        return [path, path.with_name(path.name + "-wal"), path.with_name(path.name + "-shm")]
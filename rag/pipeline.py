@@ -0,0 +1,262 @@
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from config.settings import settings
+from rag.ingest import file_sha256, iter_chunk_batches
+from rag.vector_store import SourceDiff, VectorStore
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class FileResult:
+    path: Path
+    source: Optional[str] = None
+    chunks: int = 0
+    kept: int = 0
+    removed: int = 0
+    unchanged: bool = False
+    error: Optional[str] = None
+    extract_seconds: float = 0.0
+    embed_seconds: List[float] = field(default_factory=list)
+    started: float = field(default_factory=time.perf_counter)
+    finished: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def _extract(
+    path: Path, source: Optional[str], known_hash: Optional[str], key: int, channel: Any, batch_size: int
+) -> Tuple[str, bool, float]:
+    # Runs in a worker process: hashing, PDF/DOCX parsing and chunking are CPU-bound.
+    # Chunks go to the embed stage batch by batch, so a large file is never held whole.
+    start = time.perf_counter()
+    doc_hash = file_sha256(path)
+    if doc_hash == known_hash:
+        return doc_hash, False, time.perf_counter() - start
+    for batch in iter_chunk_batches(path, batch_size, source, doc_hash):
+        channel.put((key, "batch", batch))  # blocks when the embedder falls behind
+    return doc_hash, True, time.perf_counter() - start
+
+
+def _make_pool(workers: int) -> Executor:
+    if workers <= 1:
+        return ThreadPoolExecutor(max_workers=1)
+    return ProcessPoolExecutor(max_workers=workers)
+
+
+def _make_channel(workers: int, stack: ExitStack) -> Any:
+    # Worker processes need a manager queue to stream batches back; one thread can share a plain one.
+    if workers <= 1:
+        return queue.Queue(maxsize=settings.ingest_queue_size)
+    return stack.enter_context(multiprocessing.Manager()).Queue(maxsize=settings.ingest_queue_size)
+
+
+def ingest_files(
+    paths: List[Path],
+    store: VectorStore,
+    progress: Optional[Callable[[FileResult, int, int], None]] = None,
+    workers: Optional[int] = None,
+    sources: Optional[List[str]] = None,
+    checkpoint_every: int = 0,
+) -> List[FileResult]:
+    """Ingest many files through extract -> embed -> write stages that overlap.
+
+    Extraction/chunking runs in a process pool and streams batches of up to
+    EMBED_BATCH_SIZE * EMBED_CONCURRENCY chunks to an embedding thread, and a single writer
+    thread inserts them inside one ``store.bulk()`` transaction. Stages are connected by
+    queues of at most INGEST_QUEUE_SIZE batches, so memory stays bounded however large a
+    document is, and a slow embedder throttles extraction. ``progress(result, done, total)``
+    is called on the caller's thread once per file, which keeps it safe for Streamlit UI
+    updates.
+
+    Files whose content hash matches what is stored for their source are skipped before
+    parsing; changed files are diffed batch by batch against the stored chunk hashes so only
+    new chunk texts are embedded. A file that fails halfway keeps the batches already written
+    but not its content hash, so the next run diffs it again.
+
+    With ``checkpoint_every=N`` the writer persists after every N files and only reports a
+    file once its chunks are on disk, so callers can checkpoint safely from ``progress``.
+    Without it, files are reported as soon as they are written and are only on disk once
+    this function returns.
+    """
+    workers = workers if workers is not None else settings.ingest_workers
+    write_queue: "queue.Queue" = queue.Queue(maxsize=settings.ingest_queue_size)
+    events: "queue.Queue[FileResult]" = queue.Queue()
+    batch_limit = max(settings.embed_batch_size * settings.embed_concurrency, 1)
+    results: List[FileResult] = []
+    by_key: Dict[int, FileResult] = {}
+    writer_error: List[BaseException] = []
+
+    def fail(result: FileResult, error: str) -> None:
+        result.error = error
+        result.finished = time.perf_counter()
+        events.put(result)
+
+    def embed_stage(channel: Any) -> None:
+        # Per file: stored vector IDs not yet matched by any batch (by chunk hash), plus unhashed IDs.
+        stored: Dict[int, Tuple[Dict[str, List[int]], List[int]]] = {}
+        failed: Set[int] = set()
+        while True:
+            item = channel.get()
+            if item is None:
+                write_queue.put(None)
+                return
+            key, kind, payload = item
+            result = by_key[key]
+            if kind == "error":
+                stored.pop(key, None)
+                if key in failed:
+                    failed.discard(key)
+                else:
+                    fail(result, payload)
+                continue
+            if key in failed:
+                if kind == "end":
+                    failed.discard(key)
+                continue
+            try:
+                if key not in stored:
+                    stored[key] = store.stored_chunks(result.source)
+                remaining, unhashed = stored[key]
+                if kind == "batch":
+                    diff = SourceDiff(result.source)
+                    diff.match(remaining, payload)
+                    vectors = None
+                    if diff.new:
+                        began = time.perf_counter()
+                        vectors = store.embedder.embed([meta["text"] for meta in diff.new])
+                        result.embed_seconds.append(time.perf_counter() - began)
+                    write_queue.put((result, None, diff, vectors))
+                else:
+                    # Whatever no batch matched is gone from the document.
+                    del stored[key]
+                    stale = unhashed + [vid for ids in remaining.values() for vid in ids]
+                    write_queue.put((result, payload, SourceDiff(result.source, stale=stale), None))
+            except Exception as exc:  # pylint: disable=broad-except
+                logger.exception("Embedding failed for %s", result.path.name)
+                stored.pop(key, None)
+                if kind == "batch":
+                    failed.add(key)
+                fail(result, str(exc))
+
+    def write_stage() -> None:
+        unflushed: List[FileResult] = []
+        queue_closed = False
+
+        def release() -> None:
+            for done_result in unflushed:
+                events.put(done_result)
+            unflushed.clear()
+
+        try:
+            with store.bulk():
+                while True:
+                    item = write_queue.get()
+                    if item is None:
+                        queue_closed = True
+                        break
+                    result, doc_hash, diff, vectors = item
+                    # The source hash only comes with the file's last diff, once every batch is in.
+                    store.apply_diff(doc_hash, diff, vectors)
+                    result.chunks += len(diff.new)
+                    result.kept += len(diff.kept)
+                    result.removed += len(diff.stale)
+                    if doc_hash is None:
+                        continue
+                    result.finished = time.perf_counter()
+                    logger.info(
+                        "Ingested %s: %d new, %d unchanged, %d removed chunks",
+                        result.path.name,
+                        result.chunks,
+                        result.kept,
+                        result.removed,
+                    )
+                    unflushed.append(result)
+                    if not checkpoint_every:
+                        release()
+                    elif len(unflushed) >= checkpoint_every:
+                        store.flush()
+                        release()
+                # Persist before reporting the last files, so a failed flush (e.g. an IVF retrain)
+                # never leaves them checkpointed but unsaved.
+                store.flush()
+                release()
+        except BaseException as exc:  # pylint: disable=broad-except
+            logger.exception("Index writer failed")
+            writer_error.append(exc)
+            # Keep draining so the embed stage never blocks on a full queue.
+            while not queue_closed and write_queue.get() is not None:
+                pass
+
+    def drain_events(block: bool = False) -> None:
+        while True:
+            try:
+                result = events.get(timeout=0.1) if block else events.get_nowait()
+            except queue.Empty:
+                return
+            results.append(result)
+            if progress is not None:
+                progress(result, len(results), len(paths))
+            block = False
+
+    with ExitStack() as stack:
+        channel = _make_channel(workers, stack)
+        embedder = threading.Thread(target=embed_stage, args=(channel,), name="ingest-embed", daemon=True)
+        writer = threading.Thread(target=write_stage, name="ingest-write", daemon=True)
+        embedder.start()
+        writer.start()
+        with _make_pool(workers) as pool:
+            pending: Dict[Future, int] = {}
+
+            def handle(done: Set[Future]) -> None:
+                for future in done:
+                    key = pending.pop(future)
+                    result = by_key[key]
+                    try:
+                        doc_hash, changed, result.extract_seconds = future.result()
+                    except Exception as exc:  # pylint: disable=broad-except
+                        logger.exception("Extraction failed for %s", result.path.name)
+                        channel.put((key, "error", str(exc)))
+                        continue
+                    if not changed:
+                        logger.info("%s is unchanged; skipping", result.path.name)
+                        result.unchanged = True
+                        result.finished = time.perf_counter()
+                        events.put(result)
+                        continue
+                    # Queued behind every batch the worker put before returning.
+                    channel.put((key, "end", doc_hash))
+
+            for pos, path in enumerate(paths):
+                while len(pending) >= max(workers, 1) * 2:
+                    done, _ = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+                    handle(done)
+                    drain_events()
+                source = sources[pos] if sources else path.name
+                known_hash = store.source_hash(source)
+                by_key[pos] = FileResult(path, source)
+                future = pool.submit(_extract, path, source, known_hash, pos, channel, batch_limit)
+                pending[future] = pos
+            while pending:
+                done, _ = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+                handle(done)
+                drain_events()
+        channel.put(None)
+        while writer.is_alive() or not events.empty():
+            drain_events(block=True)
+        embedder.join()
+        writer.join()
+    if writer_error:
+        raise writer_error[0]
+    return results
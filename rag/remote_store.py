@@ -0,0 +1,222 @@
+import base64
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+import requests
+
+from config.settings import settings
+from llm.embeddings import EmbeddingRouter
+from rag.vector_store import SourceDiff
+
+logger = logging.getLogger(__name__)
+
+# How long index info (version, chunk count) is reused before asking the service again.
+INFO_TTL = 1.0
+
+
+def encode_array(array: Optional[np.ndarray]) -> Optional[Dict[str, Any]]:
+    if array is None:
+        return None
+    array = np.ascontiguousarray(array, dtype="float32")
+    return {"shape": list(array.shape), "data": base64.b64encode(array.tobytes()).decode("ascii")}
+
+
+def decode_array(payload: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+    if payload is None:
+        return None
+    data = base64.b64decode(payload["data"])
+    return np.frombuffer(data, dtype="float32").reshape(payload["shape"]).copy()
+
+
+def _hits(rows: List[List[Any]]) -> List[Tuple[Dict, float]]:
+    return [(meta, float(score)) for meta, score in rows]
+
+
+class IndexServiceError(RuntimeError):
+    """The index service could not be reached or rejected a request."""
+
+
+class _RemoteMetadata:
+    """Stands in for ``VectorStore.metadata`` where callers only check size or FTS support."""
+
+    def __init__(self, store: "RemoteVectorStore") -> None:
+        self._store = store
+
+    def __len__(self) -> int:
+        return int(self._store.info()["chunks"])
+
+    @property
+    def has_fts(self) -> bool:
+        return bool(self._store.info()["has_fts"])
+
+    def close(self) -> None:
+        self._store.session.close()
+
+
+class RemoteVectorStore:
+    """``VectorStore`` interface backed by the index service (``python -m services.index_server``).
+
+    The service owns the FAISS index and metadata, so every process on the host shares one
+    copy and sees writes immediately. Query embedding happens in the service (sharing its
+    query cache); chunks being ingested are embedded here with ``embedder`` and shipped as
+    vectors, so the ingest pipeline works unchanged. Each write commits on its own, so
+    ``bulk()`` only groups calls and does not make them atomic.
+    """
+
+    def __init__(self, url: str, embedder: Optional[EmbeddingRouter] = None, timeout: Optional[float] = None) -> None:
+        self.url = url.rstrip("/")
+        self.timeout = settings.index_service_timeout if timeout is None else timeout
+        self.embedder = embedder or EmbeddingRouter()
+        self.session = requests.Session()
+        self.metadata = _RemoteMetadata(self)
+        self._info: Dict[str, Any] = {}
+        self._info_at = 0.0
+        self._changes: Optional[int] = None
+        self._listeners: List[Callable[[Set[str]], None]] = []
+        self._lock = threading.Lock()
+
+    def _call(self, path: str, timeout: Optional[float] = None, **payload: Any) -> Dict[str, Any]:
+        try:
+            if payload:
+                response = self.session.post(f"{self.url}{path}", json=payload, timeout=timeout or self.timeout)
+            else:
+                response = self.session.get(f"{self.url}{path}", timeout=timeout or self.timeout)
+        except requests.RequestException as exc:
+            raise IndexServiceError(f"Index service at {self.url} unreachable: {exc}") from exc
+        if response.status_code != 200:
+            raise IndexServiceError(f"Index service {path} failed ({response.status_code}): {response.text[:200]}")
+        return response.json()
+
+    def info(self, refresh: bool = False) -> Dict[str, Any]:
+        """Index version, chunk count and change counter, cached for INFO_TTL seconds."""
+        with self._lock:
+            if not refresh and self._info and time.monotonic() - self._info_at < INFO_TTL:
+                return self._info
+        info = self._call("/info")
+        with self._lock:
+            previous, self._changes = self._changes, info["changes"]
+            self._info, self._info_at = info, time.monotonic()
+        if previous is not None and previous != info["changes"]:
+            self._notify_changes(previous)
+        return info
+
+    def _notify_changes(self, since: int) -> None:
+        # Another process changed sources: tell local listeners (e.g. the answer cache).
+        changed = self._call(f"/changes?since={since}")["sources"]
+        sources = set(changed) if changed is not None else set(self.sources)
+        if changed is None:
+            logger.info("Index change log no longer covers %d; treating every source as changed", since)
+        for callback in self._listeners:
+            try:
+                callback(sources)
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Source change listener failed")
+
+    @property
+    def version(self) -> int:
+        return int(self.info()["version"])
+
+    @property
+    def sources(self) -> List[str]:
+        return self._call("/sources")["sources"]
+
+    def on_sources_changed(self, callback: Callable[[Set[str]], None]) -> None:
+        """Call ``callback(source_names)`` once a write by any process is noticed here."""
+        self._listeners.append(callback)
+
+    def _after_write(self) -> None:
+        self.info(refresh=True)
+
+    def clear(self) -> None:
+        self._call("/clear", confirm=True)
+        self._after_write()
+
+    def reload(self) -> None:
+        self._call("/reload", confirm=True)
+        self._after_write()
+
+    @contextmanager
+    def bulk(self) -> Iterator["RemoteVectorStore"]:
+        yield self
+
+    def flush(self) -> None:
+        pass
+
+    def add_texts(self, texts: List[str], metadatas: List[Dict]) -> int:
+        vectors = self.embedder.embed(texts)
+        added = self._call("/add_embeddings", metadatas=metadatas, vectors=encode_array(vectors))["added"]
+        self._after_write()
+        return added
+
+    def remove_source(self, source_name: str) -> int:
+        removed = self._call("/remove_source", source=source_name)["removed"]
+        self._after_write()
+        return removed
+
+    def source_hash(self, source_name: str) -> Optional[str]:
+        return self._call("/source_hash", source=source_name)["hash"]
+
+    def stored_chunks(self, source_name: str) -> Tuple[Dict[str, List[int]], List[int]]:
+        payload = self._call("/stored_chunks", source=source_name)
+        return payload["stored"], payload["unhashed"]
+
+    def diff_source(self, source_name: str, metadatas: List[Dict]) -> SourceDiff:
+        diff = self._call("/diff_source", source=source_name, metadatas=metadatas)
+        return SourceDiff(source_name, diff["new"], [(int(vid), meta) for vid, meta in diff["kept"]], diff["stale"])
+
+    def apply_diff(self, doc_hash: Optional[str], diff: SourceDiff, vectors: Optional[np.ndarray] = None) -> None:
+        self._call(
+            "/apply_diff",
+            doc_hash=doc_hash,
+            source=diff.source,
+            new=diff.new,
+            kept=diff.kept,
+            stale=diff.stale,
+            vectors=encode_array(vectors),
+        )
+        self._after_write()
+
+    def sync_source(
+        self, source_name: str, doc_hash: str, batches: Iterable[List[Dict]]
+    ) -> Optional[Dict[str, int]]:
+        """Like ``VectorStore.sync_source``, but the document is diffed in one piece."""
+        if self.source_hash(source_name) == doc_hash:
+            return None
+        metadatas = [meta for batch in batches for meta in batch]
+        diff = self.diff_source(source_name, metadatas)
+        vectors = self.embedder.embed([meta["text"] for meta in diff.new]) if diff.new else None
+        self.apply_diff(doc_hash, diff, vectors)
+        return {"new": len(diff.new), "kept": len(diff.kept), "removed": len(diff.stale)}
+
+    def embed_query(self, query: str) -> np.ndarray:
+        return self.embed_queries([query])
+
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        return decode_array(self._call("/embed_queries", queries=queries)["vectors"])
+
+    def embed_query_within(self, query: str, timeout: float) -> Optional[np.ndarray]:
+        try:
+            payload = self._call("/embed_query_within", timeout=timeout + self.timeout, query=query, within=timeout)
+        except IndexServiceError:
+            logger.exception("Query embedding via the index service failed")
+            return None
+        return decode_array(payload["vector"])
+
+    def search(self, query: str, top_k: int = 4) -> List[Tuple[Dict, float]]:
+        return self.search_many([query], top_k)[0]
+
+    def search_many(
+        self, queries: List[str], top_k: int = 4, min_score: float = 0.0
+    ) -> List[List[Tuple[Dict, float]]]:
+        results = self._call("/search_many", queries=queries, top_k=top_k, min_score=min_score)["results"]
+        return [_hits(rows) for rows in results]
+
+    def lexical_search(self, query: str, top_k: int = 4) -> List[Tuple[Dict, float]]:
+        return _hits(self._call("/lexical_search", query=query, top_k=top_k)["hits"])
+
+    def hybrid_search(self, query: str, top_k: int = 4) -> List[Tuple[Dict, float]]:
+        return _hits(self._call("/hybrid_search", query=query, top_k=top_k)["hits"])
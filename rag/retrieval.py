@@ -1,17 +1,173 @@
-from typing import Dict, Iterator, List, Tuple
+import contextvars
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
 
+import numpy as np
+
+from config.settings import settings
 from llm.client import LLMRouter, build_policy_prompt, build_conversational_prompt # Updated imports
+from rag.answer_cache import AnswerCache, CachedAnswer, replay_stream
+from rag.intent import get_local_classifier
 from rag.vector_store import VectorStore
+from services import tracing
+
+logger = logging.getLogger(__name__)
 
 SCORE_THRESHOLD = 0.55
+NO_INFO_ANSWER = "No information found."
+
+# Runs retrieval speculatively while the intent classifier is still generating.
+_speculative_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="speculative-retrieval")
+
+
+@contextmanager
+def _stage(timings: Dict[str, float], name: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        with tracing.span(name[:-3] if name.endswith("_ms") else name):
+            yield
+    finally:
+        timings[name] = (time.perf_counter() - start) * 1000
+
+
+def _timed_retrieve(question: str, store: VectorStore, timings: Dict[str, float]) -> List[Tuple[Dict, float]]:
+    with _stage(timings, "retrieval_ms"):
+        return retrieve(question, store)
+
+
+def _classify_and_retrieve(
+    question: str,
+    store: VectorStore,
+    llm: LLMRouter,
+    timings: Dict[str, float],
+    hits: Optional[List[Tuple[Dict, float]]] = None,
+) -> Tuple[str, List[Tuple[Dict, float]]]:
+    """Classify intent and, for HR questions, retrieve hits (unless ``hits`` were prefetched).
+
+    With speculative retrieval enabled both run concurrently and the hits are dropped
+    when the question turns out to be chitchat/non_hr.
+    """
+    local_store = store if settings.intent_local else None
+    if hits is not None:
+        with _stage(timings, "intent_ms"):
+            intent = classify_intent(question, llm, local_store)
+        return intent, [] if intent in ("chitchat", "non_hr") else hits
+    if not settings.speculative_retrieval:
+        with _stage(timings, "intent_ms"):
+            intent = classify_intent(question, llm, local_store)
+        if intent in ("chitchat", "non_hr"):
+            return intent, []
+        return intent, _timed_retrieve(question, store, timings)
+    # Run in a copy of this context so the retrieval spans nest under the request span.
+    future = _speculative_pool.submit(contextvars.copy_context().run, _timed_retrieve, question, store, timings)
+    with _stage(timings, "intent_ms"):
+        intent = classify_intent(question, llm, local_store)
+    if intent in ("chitchat", "non_hr"):
+        future.cancel()
+        return intent, []
+    with _stage(timings, "retrieval_wait_ms"):
+        hits = future.result()
+    return intent, hits
+
+
+def _log_timings(question: str, timings: Dict[str, float]) -> None:
+    logger.info(
+        "Stage timings for %r: %s", question[:80], ", ".join(f"{k}={v:.1f}" for k, v in timings.items())
+    )
+
+
+def _with_first_token_timing(
+    stream: Iterator[str], question: str, started: float, timings: Dict[str, float]
+) -> Iterator[str]:
+    first = True
+    for token in stream:
+        if first:
+            first = False
+            timings["ttft_ms"] = (time.perf_counter() - started) * 1000
+            _log_timings(question, timings)
+        yield token
+
+
+def _cache_lookup(
+    question: str, store: VectorStore, cache: Optional[AnswerCache]
+) -> Tuple[Optional[np.ndarray], Optional[CachedAnswer]]:
+    if cache is None or not store.metadata:
+        return None, None
+    # Bounded like hybrid retrieval: a slow embedder must not delay the lexical fast path.
+    query_vec = store.embed_query_within(question, settings.query_embed_timeout)
+    if query_vec is None:
+        logger.info("Answer cache lookup skipped; no query embedding")
+        return None, None
+    vector = query_vec[0]
+    hit = cache.lookup(vector)
+    if hit is not None:
+        logger.info("Answer cache hit for %r (cached question %r)", question[:80], hit.question[:80])
+    return vector, hit
+
+
+def _caching_stream(
+    stream: Iterator[str], cache: AnswerCache, question: str, vector: np.ndarray, citations: List[Dict]
+) -> Iterator[str]:
+    tokens: List[str] = []
+    for token in stream:
+        tokens.append(token)
+        yield token
+    answer = "".join(tokens).strip()
+    # Only complete, grounded answers are cached.
+    if answer and answer != NO_INFO_ANSWER:
+        cache.put(question, vector, answer, citations)
 
 
 def retrieve(question: str, store: VectorStore, top_k: int = 3) -> List[Tuple[Dict, float]]:
+    if settings.hybrid_retrieval:
+        return store.hybrid_search(question, top_k=top_k)
     return store.search(question, top_k=top_k)
 
 
-def answer_question(question: str, store: VectorStore, llm: LLMRouter) -> Dict:
-    intent = classify_intent(question, llm)
+def retrieve_many(questions: List[str], store: VectorStore, top_k: int = 3) -> List[List[Tuple[Dict, float]]]:
+    """Hits for many questions at once, already filtered by SCORE_THRESHOLD.
+
+    Queries are embedded in one batch. Dense-only search also shares one index lookup;
+    hybrid search then fuses per question using the cached query vectors.
+    """
+    if not settings.hybrid_retrieval:
+        return store.search_many(questions, top_k=top_k, min_score=SCORE_THRESHOLD)
+    store.embed_queries(questions)
+    return [
+        [(meta, score) for meta, score in store.hybrid_search(question, top_k=top_k) if score >= SCORE_THRESHOLD]
+        for question in questions
+    ]
+
+
+def answer_question(
+    question: str,
+    store: VectorStore,
+    llm: LLMRouter,
+    cache: Optional[AnswerCache] = None,
+    hits: Optional[List[Tuple[Dict, float]]] = None,
+) -> Dict:
+    """Answer one question; pass ``hits`` from ``retrieve_many`` to skip retrieval."""
+    with tracing.span("answer_question", question=question[:80]) as span:
+        result = _answer_question(question, store, llm, cache, hits)
+        span.set(grounded=result["grounded"], citations=len(result["citations"]))
+        return result
+
+
+def _answer_question(
+    question: str,
+    store: VectorStore,
+    llm: LLMRouter,
+    cache: Optional[AnswerCache],
+    hits: Optional[List[Tuple[Dict, float]]],
+) -> Dict:
+    vector, cached = _cache_lookup(question, store, cache)
+    if cached is not None:
+        return {"answer": cached.answer, "citations": cached.citations, "grounded": True}
+    timings: Dict[str, float] = {}
+    intent, hits = _classify_and_retrieve(question, store, llm, timings, hits)
     
     # 1. Handle Conversational Intents (Let model generate response)
     if intent in ("chitchat", "non_hr"):
@@ -24,17 +180,18 @@ def answer_question(question: str, store: VectorStore, llm: LLMRouter) -> Dict:
         }
         
     # 2. Handle HR Policy (RAG)
-    hits = retrieve(question, store)
     filtered_hits = [(meta, score) for meta, score in hits if score >= SCORE_THRESHOLD]
     contexts = [meta["text"] for meta, _ in filtered_hits]
 
     # If nothing relevant, return explicit no-info
     if not contexts:
-        return {"answer": "No information found.", "citations": [], "grounded": False}
+        return {"answer": NO_INFO_ANSWER, "citations": [], "grounded": False}
 
     # Use the dedicated policy prompt
     prompt = build_policy_prompt(question, contexts)
-    answer = llm.generate(prompt)
+    with _stage(timings, "generate_ms"):
+        answer = llm.generate(prompt)
+    _log_timings(question, timings)
 
     citations = [
         {
@@ -47,20 +204,49 @@ def answer_question(question: str, store: VectorStore, llm: LLMRouter) -> Dict:
         for meta, score in filtered_hits
     ]
     grounded = bool(contexts)
+    if cache is not None and vector is not None and answer.strip() and answer.strip() != NO_INFO_ANSWER:
+        cache.put(question, vector, answer, citations)
     return {"answer": answer, "citations": citations, "grounded": grounded}
 
 
-def answer_question_stream(question: str, store: VectorStore, llm: LLMRouter) -> Tuple[Iterator[str], List[Dict], bool]:
-    intent = classify_intent(question, llm)
+def answer_question_stream(
+    question: str, store: VectorStore, llm: LLMRouter, cache: Optional[AnswerCache] = None
+) -> Tuple[Iterator[str], List[Dict], bool]:
+    """Stream an answer; the request span stays open until the stream is exhausted or closed."""
+    if not tracing.enabled():
+        return _answer_question_stream(question, store, llm, cache)
+    span = tracing.span("answer_question_stream", question=question[:80])
+    span.__enter__()
+    try:
+        stream, citations, grounded = _answer_question_stream(question, store, llm, cache)
+    except BaseException as exc:
+        span.__exit__(type(exc), exc, exc.__traceback__)
+        raise
+    span.set(grounded=grounded, citations=len(citations))
+    # Hand the span to the stream: spans started while streaming nest under it, and the
+    # caller's context is left as it was.
+    span.detach()
+    return tracing.traced_stream(stream, span, finish=True), citations, grounded
+
+
+def _answer_question_stream(
+    question: str, store: VectorStore, llm: LLMRouter, cache: Optional[AnswerCache]
+) -> Tuple[Iterator[str], List[Dict], bool]:
+    started = time.perf_counter()
+    vector, cached = _cache_lookup(question, store, cache)
+    if cached is not None:
+        # Replay the cached answer as a stream so the UI renders it the same way.
+        return replay_stream(cached.answer), cached.citations, True
+    timings: Dict[str, float] = {}
+    intent, hits = _classify_and_retrieve(question, store, llm, timings)
     
     # 1. Handle Conversational Intents (Let model generate streamed response)
     if intent in ("chitchat", "non_hr"):
         prompt = build_conversational_prompt(question, intent)
         # Stream the dynamic conversational response
-        return llm.stream(prompt), [], False
+        return _with_first_token_timing(llm.stream(prompt), question, started, timings), [], False
         
     # 2. Handle HR Policy (RAG)
-    hits = retrieve(question, store)
     filtered_hits = [(meta, score) for meta, score in hits if score >= SCORE_THRESHOLD]
     contexts = [meta["text"] for meta, _ in filtered_hits]
     
@@ -79,12 +265,15 @@ def answer_question_stream(question: str, store: VectorStore, llm: LLMRouter) ->
     # If policy question but no context, send a hard no-info response
     if not contexts:
         def _no_context() -> Iterator[str]:
-            yield "No information found."
+            yield NO_INFO_ANSWER
         return _no_context(), [], False  # Citations empty when no context
     
     # Use the dedicated policy prompt for grounded answers
     prompt = build_policy_prompt(question, contexts)
-    return llm.stream(prompt), citations, grounded
+    stream = _with_first_token_timing(llm.stream(prompt), question, started, timings)
+    if cache is not None and vector is not None:
+        stream = _caching_stream(stream, cache, question, vector, citations)
+    return stream, citations, grounded
 
 
 def is_hr_query(question: str) -> bool:
@@ -92,7 +281,29 @@ def is_hr_query(question: str) -> bool:
     return True
 
 
-def classify_intent(question: str, llm: LLMRouter) -> str:
+def classify_intent(question: str, llm: LLMRouter, store: Optional[VectorStore] = None) -> str:
+    # Fast path: regex/nearest-centroid classifier; only unsure cases pay for an LLM generation.
+    # The query vector comes from the store's cache, so retrieval does not embed it again.
+    if store is not None:
+        skipped = False
+
+        def embed_query(query: str) -> Optional[np.ndarray]:
+            nonlocal skipped
+            vector = store.embed_query_within(query, settings.query_embed_timeout)
+            skipped = vector is None
+            return vector
+
+        label, confidence = get_local_classifier(store.embedder).predict(question, embed_query)
+        if label is not None:
+            logger.debug("Local intent %s (confidence %.2f)", label, confidence)
+            return label
+        if skipped:
+            # The embedder is down or slow; don't add an LLM round trip on top of the wait.
+            return "hr_policy"
+    return classify_intent_llm(question, llm)
+
+
+def classify_intent_llm(question: str, llm: LLMRouter) -> str:
     prompt = (
         "Classify the user message into one of: hr_policy, non_hr, chitchat.\n"
         "hr_policy: HR policies/procedures (leave, PTO, benefits, conduct, onboarding, payroll, attendance, dress code, harassment, travel/expenses, parental/bereavement/sick leave).\n"
@@ -0,0 +1,210 @@
+import itertools
+import logging
+import math
+import queue
+import threading
+import time
+import weakref
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from config.settings import settings
+from llm.client import LLMRouter
+from llm.embedding_cache import QueryCache
+from rag.answer_cache import AnswerCache
+from rag.retrieval import answer_question_stream
+from rag.vector_store import VectorStore
+from services import tracing
+
+logger = logging.getLogger(__name__)
+
+
+class Overloaded(RuntimeError):
+    """The answer queue is full, or a request waited longer than ANSWER_QUEUE_TIMEOUT."""
+
+
+class _Flight:
+    """One answer generation whose tokens are buffered for every subscriber."""
+
+    def __init__(self, key: Tuple[str, int], question: str) -> None:
+        self.key = key
+        self.question = question
+        self.enqueued = time.monotonic()
+        self.waiters = 0
+        self.citations: List[Dict] = []
+        self.grounded = False
+        self.started = False
+        self.ready = threading.Event()
+        self._cond = threading.Condition()
+        self._tokens: List[str] = []
+        self._done = False
+        self.error: Optional[BaseException] = None
+
+    def start(self, citations: List[Dict], grounded: bool) -> None:
+        self.citations, self.grounded, self.started = citations, grounded, True
+        self.ready.set()
+
+    def publish(self, token: str) -> None:
+        with self._cond:
+            self._tokens.append(token)
+            self._cond.notify_all()
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        with self._cond:
+            self._done, self.error = True, error
+            self._cond.notify_all()
+        self.ready.set()
+
+    def subscribe(self) -> Iterator[str]:
+        """Replay the tokens so far, then follow the generation until it ends."""
+        pos = 0
+        while True:
+            with self._cond:
+                while pos >= len(self._tokens) and not self._done:
+                    self._cond.wait()
+                pending, done = self._tokens[pos:], self._done
+            pos += len(pending)
+            yield from pending
+            if done:
+                if self.error is not None:
+                    raise self.error
+                return
+
+
+def _work(coalescer_ref: "weakref.ReferenceType[AnswerCoalescer]", jobs: "queue.PriorityQueue") -> None:
+    # Holds only a weak reference while idle, so a dropped coalescer (and its store) can be
+    # collected; its finalizer then queues the stop entry that ends this loop.
+    while True:
+        _, _, flight = jobs.get()
+        coalescer = coalescer_ref()
+        if flight is None or coalescer is None:
+            return
+        coalescer._serve(flight)  # pylint: disable=protected-access
+        del coalescer
+
+
+def _stop_workers(jobs: "queue.PriorityQueue", seq: Iterator[int], workers: int) -> None:
+    # Sorted after every queued flight, so work already admitted still runs.
+    for _ in range(workers):
+        jobs.put((math.inf, next(seq), None))
+
+
+class AnswerCoalescer:
+    """Single-flight answering behind a bounded priority queue.
+
+    Requests for the same normalized question against the same index version share one
+    generation and each get the full token stream. New generations wait in a queue of at
+    most ``max_queue`` (higher ``priority`` first) for one of ``max_active`` worker slots;
+    when it is full, or a request waits longer than ``queue_timeout``, ``Overloaded`` is
+    raised so the caller can answer "busy" at once instead of timing out. With
+    ``max_queue=0`` a request is admitted only while a slot is free. ``close()`` (or
+    garbage collection) stops the workers.
+    """
+
+    def __init__(
+        self,
+        store: VectorStore,
+        llm: LLMRouter,
+        cache: Optional[AnswerCache] = None,
+        max_active: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        queue_timeout: Optional[float] = None,
+    ) -> None:
+        self.store = store
+        self.llm = llm
+        self.cache = cache
+        self.max_active = max(max_active or settings.answer_concurrency, 1)
+        self.max_queue = settings.answer_queue_size if max_queue is None else max_queue
+        self.queue_timeout = settings.answer_queue_timeout if queue_timeout is None else queue_timeout
+        self.stats = {"requests": 0, "admitted": 0, "coalesced": 0, "rejected": 0, "timed_out": 0}
+        self._flights: Dict[Tuple[str, int], _Flight] = {}
+        self._queue: "queue.PriorityQueue[Tuple[float, int, Optional[_Flight]]]" = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._active = 0
+        self._lock = threading.Lock()
+        self._closer = weakref.finalize(self, _stop_workers, self._queue, self._seq, self.max_active)
+        for n in range(self.max_active):
+            threading.Thread(
+                target=_work, args=(weakref.ref(self), self._queue), name=f"answer-worker-{n}", daemon=True
+            ).start()
+
+    def close(self) -> None:
+        """Stop the workers once the flights already queued have run; later calls are no-ops."""
+        self._closer()
+
+    def _count(self, outcome: str) -> None:
+        # Called with self._lock held.
+        self.stats[outcome] += 1
+        tracing.increment("answers", outcome=outcome)
+
+    def _update_gauges(self) -> None:
+        tracing.set_gauge("queue_depth", self._queue.qsize())
+        tracing.set_gauge("active", self._active)
+
+    def answer_stream(self, question: str, priority: int = 0) -> Tuple[Iterator[str], List[Dict], bool]:
+        """Drop-in for ``answer_question_stream`` that joins an identical in-flight request."""
+        if not self._closer.alive:
+            raise Overloaded("the answer workers were stopped")
+        key = (QueryCache.key(question), self.store.version)
+        with self._lock:
+            self.stats["requests"] += 1
+            flight = self._flights.get(key)
+            if flight is not None:
+                self._count("coalesced")
+            elif self._queue.qsize() >= self.max_queue + self.max_active - self._active:
+                # Idle workers take a queued flight at once, so only the rest counts as waiting.
+                self._count("rejected")
+                raise Overloaded(f"{self._queue.qsize()} answers already queued")
+            else:
+                self._count("admitted")
+                flight = self._flights[key] = _Flight(key, question)
+                self._queue.put((-priority, next(self._seq), flight))
+                self._update_gauges()
+            flight.waiters += 1
+        if not flight.ready.wait(self.queue_timeout):
+            with self._lock:
+                flight.waiters -= 1
+                self._count("timed_out")
+            raise Overloaded(f"waited {self.queue_timeout:.0f}s for an answer slot")
+        if not flight.started:
+            raise flight.error or RuntimeError("Answer generation failed")
+        return flight.subscribe(), flight.citations, flight.grounded
+
+    def _serve(self, flight: _Flight) -> None:
+        with self._lock:
+            # Every requester gave up while it was queued: skip the generation.
+            abandoned = flight.waiters == 0
+            if abandoned:
+                self._flights.pop(flight.key, None)
+            else:
+                self._active += 1
+            self._update_gauges()
+        if abandoned:
+            return
+        tracing.observe("queue_wait", time.monotonic() - flight.enqueued)
+        try:
+            self._run(flight)
+        finally:
+            with self._lock:
+                self._active -= 1
+                if self._flights.get(flight.key) is flight:
+                    del self._flights[flight.key]
+                self._update_gauges()
+
+    def _run(self, flight: _Flight) -> None:
+        try:
+            stream, citations, grounded = answer_question_stream(flight.question, self.store, self.llm, self.cache)
+        except Exception as exc:  # pylint: disable=broad-except
+            logger.exception("Answering %r failed", flight.question[:80])
+            flight.finish(exc)
+            return
+        flight.start(citations, grounded)
+        # Drained here rather than by a subscriber, so a slow or closed browser tab
+        # never stalls the others.
+        try:
+            for token in stream:
+                flight.publish(token)
+        except Exception as exc:  # pylint: disable=broad-except
+            logger.exception("Answer stream for %r failed", flight.question[:80])
+            flight.finish(exc)
+            return
+        flight.finish()
@@ -1,101 +1,824 @@
+import contextvars
 import json
 import logging
+import os
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeout
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import IO, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
 import faiss
 import numpy as np
 
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, so keep to one writing process per store.
+    fcntl = None
+
+from config.settings import settings
+from llm.embedding_cache import QueryCache
 from llm.embeddings import EmbeddingRouter
+from rag.index_factory import (
+    apply_search_params,
+    build_index,
+    can_build,
+    choose_kind,
+    index_kind,
+    needs_retrain,
+    recall_at_k,
+    stored_ids,
+    supports_removal,
+)
+from rag.lexical import fts_query, rrf_fuse, term_coverage
+from rag.metadata_store import MetadataStore
+from services import tracing
 
 logger = logging.getLogger(__name__)
 
+# Inside bulk() pending texts are embedded in groups of this size so memory stays bounded.
+_PENDING_EMBED_LIMIT = 512
+
+# Query embeddings run here so a slow embedder can be abandoned in favour of BM25 results.
+_query_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="query-embed")
+
+
+# Source changes kept in the manifest, so a reader that skipped versions can still invalidate precisely.
+MANIFEST_HISTORY = 64
+
+
+def read_manifest(path: Path) -> Optional[Dict]:
+    try:
+        with path.open() as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _stat_key(path: Path) -> Optional[Tuple[int, int, int]]:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+def _file_id(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_dev, stat.st_ino
+
+
+def _lock_exclusive(path: Path) -> Optional[IO]:
+    """Block until this process holds the advisory lock on ``path`` (None where unsupported)."""
+    if fcntl is None:
+        return None
+    handle = path.open("a")
+    fcntl.flock(handle, fcntl.LOCK_EX)
+    return handle
+
+
+def _unlock(handle: Optional[IO]) -> None:
+    if handle is not None:
+        fcntl.flock(handle, fcntl.LOCK_UN)
+        handle.close()
+
+
+class StaleIndexError(RuntimeError):
+    """Another process persisted a newer index while this one was writing."""
+
+
+def _watch(store_ref: "weakref.ReferenceType[VectorStore]", interval: float) -> None:
+    # Holds only a weak reference, so the thread ends once its store is garbage collected.
+    while True:
+        time.sleep(interval)
+        store = store_ref()
+        if store is None:
+            return
+        try:
+            store.check_for_updates()
+        except Exception:  # pylint: disable=broad-except
+            logger.exception("Checking %s for a newer index failed", store.manifest_path)
+        del store
+
+
+def _atomic_write(path: Path, write: Callable[[Path], None]) -> None:
+    """Write via ``write(tmp_path)`` then rename over ``path`` so readers never see a partial file."""
+    tmp_path = path.with_name(path.name + ".tmp")
+    write(tmp_path)
+    with tmp_path.open("rb") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+@dataclass
+class SourceDiff:
+    """How a re-ingested document's chunks map onto what is already stored for its source.
+
+    ``new`` chunks must be embedded, ``kept`` pairs stored vector IDs with the metadata of an
+    identical new chunk, and ``stale`` are vector IDs whose text no longer appears.
+    """
+
+    source: str
+    new: List[Dict] = field(default_factory=list)
+    kept: List[Tuple[int, Dict]] = field(default_factory=list)
+    stale: List[int] = field(default_factory=list)
+
+    def match(self, stored: Dict[str, List[int]], metadatas: List[Dict]) -> None:
+        """Sort ``metadatas`` into new/kept, consuming matched IDs from ``stored``."""
+        for meta in metadatas:
+            ids = stored.get(meta.get("chunk_hash"))
+            if ids:
+                self.kept.append((ids.pop(), meta))
+            else:
+                self.new.append(meta)
+
 
 class VectorStore:
-    def __init__(self, index_path: Path) -> None:
+    def __init__(self, index_path: Path, embedder: Optional[EmbeddingRouter] = None) -> None:
         self.index_path = index_path
-        self.meta_path = index_path.with_suffix(".meta.json")
-        self.embedder = EmbeddingRouter()
-        self.metadata: List[Dict] = []
-        self.index: faiss.IndexFlatIP | None = None
+        self.meta_path = index_path.with_suffix(".meta.sqlite")
+        # Pre-SQLite metadata file; imported once and then removed.
+        self.legacy_meta_path = index_path.with_suffix(".meta.json")
+        # Written after every commit; other processes watch it to hot-swap the new index.
+        self.manifest_path = index_path.with_suffix(".manifest.json")
+        self._manifest_stat: Optional[Tuple[int, int, int]] = None
+        # Writers in every process take this file lock around insert + persist.
+        self.lock_path = index_path.with_suffix(".lock")
+        self._lock_handle: Optional[IO] = None
+        self._write_depth = 0
+        self.embedder = embedder or EmbeddingRouter()
+        # Query vectors by normalized text; shared by every session using this store.
+        self.query_cache = QueryCache(settings.query_cache_size)
+        # Chunk metadata keyed by the vector ID stored in the FAISS index; rows load on demand.
+        self.metadata = MetadataStore(self.meta_path)
+        # Identity of the SQLite file; a different one means the store was wiped and recreated.
+        self._meta_id = _file_id(self.meta_path)
+        self.index: faiss.Index | None = None
+        self.version = 0
+        self._next_id = 0
+        # Serializes writers; bulk() holds it for the whole transaction.
+        self._lock = threading.RLock()
+        self._bulk_depth = 0
+        self._dirty = False
+        self._pending_texts: List[str] = []
+        self._pending_metadatas: List[Dict] = []
+        # Sources touched since the last persist, reported to listeners once the write commits.
+        self._changed_sources: Set[str] = set()
+        self._listeners: List[Callable[[Set[str]], None]] = []
         self._load()
         # Best-effort refresh in case cache persisted an old embedder without statuses
         if not hasattr(self.embedder, "provider_statuses"):
             self.embedder = EmbeddingRouter()
+        if settings.index_watch_interval > 0:
+            threading.Thread(
+                target=_watch,
+                args=(weakref.ref(self), settings.index_watch_interval),
+                name="index-watcher",
+                daemon=True,
+            ).start()
+
+    @staticmethod
+    def persisted_files(index_path: Path) -> List[Path]:
+        """Every file a store at ``index_path`` may write, for callers that wipe it from disk.
+
+        The manifest is left out on purpose: it keeps the version counter, so the next store
+        continues above the wiped one and running readers notice the change.
+        """
+        meta_path = index_path.with_suffix(".meta.sqlite")
+        return [index_path, index_path.with_suffix(".meta.json"), *MetadataStore.files_for(meta_path)]
+
+    @property
+    def sources(self) -> List[str]:
+        return self.metadata.sources()
 
     def _load(self) -> None:
-        if self.index_path.exists() and self.meta_path.exists():
+        self.version = 0
+        self._next_id = 0
+        self._dirty = False
+        self._pending_texts, self._pending_metadatas = [], []
+        self._changed_sources = set()
+        # Drop anything an aborted bulk() wrote but never committed.
+        self.metadata.rollback()
+        self.index = None
+        if self.index_path.exists() and self.legacy_meta_path.exists():
+            self.index = faiss.read_index(str(self.index_path))
+            self._migrate_json()
+        elif self.index_path.exists() and len(self.metadata):
             logger.info("Loading vector store from %s", self.index_path)
             self.index = faiss.read_index(str(self.index_path))
-            with self.meta_path.open() as f:
-                self.metadata = json.load(f)
+            self._next_id = self.metadata.get_state("next_id")
+            self.version = self.metadata.get_state("version")
+            if self.metadata.get_state("ntotal", self.index.ntotal) != self.index.ntotal:
+                self._reconcile()
         else:
             self.index_path.parent.mkdir(parents=True, exist_ok=True)
-            self.index = None
-            self.metadata = []
+            if len(self.metadata):
+                # Metadata without an index cannot be searched; start from a clean store.
+                self.metadata.clear()
+                self.metadata.commit()
+        if self.index is not None:
+            apply_search_params(self.index, settings.ivf_nprobe, settings.hnsw_ef_search)
+        self._manifest_stat = _stat_key(self.manifest_path)
+        manifest = read_manifest(self.manifest_path)
+        if manifest is not None:
+            # Clearing the store wipes the metadata state, but versions must keep increasing.
+            self.version = max(self.version, manifest["version"])
+
+    def _migrate_json(self) -> None:
+        """Import ``index.meta.json`` (list or ID-keyed payload) into the SQLite metadata store."""
+        with self.legacy_meta_path.open() as f:
+            payload = json.load(f)
+        if isinstance(payload, list):
+            # Positional IndexFlatIP: wrap it in an ID map, reusing its stored vectors.
+            logger.info("Migrating legacy flat index with %d vectors to an ID-mapped index", self.index.ntotal)
+            vectors = self.index.reconstruct_n(0, self.index.ntotal)
+            index = faiss.IndexIDMap2(faiss.IndexFlatIP(vectors.shape[1]))
+            index.add_with_ids(vectors, np.arange(len(vectors), dtype="int64"))
+            self.index = index
+            chunks = dict(enumerate(payload))
+            self._next_id = len(payload)
+        else:
+            chunks = {int(vid): meta for vid, meta in payload["chunks"].items()}
+            self._next_id = payload["next_id"]
+            self.version = payload.get("version", 0)
+        logger.info("Importing %d chunks from %s", len(chunks), self.legacy_meta_path)
+        self.metadata.clear()
+        self.metadata.add(list(chunks.keys()), list(chunks.values()))
+        self._save()
+        self.legacy_meta_path.unlink()
+
+    def _reconcile(self) -> None:
+        """Repair a crash between renaming the index and committing its metadata.
+
+        Vectors without metadata are tombstones that search skips, as long as their IDs are
+        never handed out again; metadata whose vectors were already removed from the index
+        must be dropped.
+        """
+        present = stored_ids(self.index)
+        known = self.metadata.all_ids()
+        orphaned = known[~np.isin(known, present)].tolist()
+        if orphaned:
+            self.metadata.delete_ids(orphaned)
+            logger.warning("Index and metadata were out of sync; dropped %d orphaned chunks", len(orphaned))
+        if len(present):
+            self._next_id = max(self._next_id, int(present.max()) + 1)
+        self.metadata.set_state(next_id=self._next_id, ntotal=self.index.ntotal)
+        self.metadata.commit()
+
+    def _check_latest(self) -> Optional[Dict]:
+        """Return the manifest, or discard this write if another process persisted since it began.
+
+        Only possible without the file lock; going on would reuse vector IDs or overwrite
+        the other writer's index.
+        """
+        manifest = read_manifest(self.manifest_path)
+        if manifest is not None and manifest["version"] > self.version:
+            logger.error(
+                "Index version %d on disk is newer than %d; discarding this write", manifest["version"], self.version
+            )
+            self._load()
+            raise StaleIndexError(f"{self.index_path} was written by another process (version {manifest['version']})")
+        return manifest
 
     def _save(self) -> None:
+        previous = self._check_latest()
+        self.version += 1
         if self.index is None:
             # Clean up persisted files if index is empty
             if self.index_path.exists():
                 self.index_path.unlink()
-            if self.meta_path.exists():
-                self.meta_path.unlink()
+            self.metadata.clear()
+            self.metadata.commit()
+        else:
+            # Index first, metadata commit last: the commit is the transaction's commit point (see _reconcile).
+            _atomic_write(self.index_path, lambda path: faiss.write_index(self.index, str(path)))
+            self.metadata.set_state(version=self.version, next_id=self._next_id, ntotal=self.index.ntotal)
+            self.metadata.commit()
+        self._write_manifest(previous)
+        self._notify_changes()
+
+    def _write_manifest(self, previous: Optional[Dict]) -> None:
+        changes = (previous or {}).get("changes", [])[-(MANIFEST_HISTORY - 1):]
+        changes.append([self.version, sorted(self._changed_sources)])
+        manifest = {
+            "version": self.version,
+            "empty": self.index is None,
+            "next_id": self._next_id,
+            "changes": changes,
+        }
+        _atomic_write(self.manifest_path, lambda path: path.write_text(json.dumps(manifest)))
+        self._manifest_stat = _stat_key(self.manifest_path)
+
+    @contextmanager
+    def _writing(self) -> Iterator[None]:
+        """Hold the writer lock, in this process and across processes, for one write.
+
+        The outermost scope first swaps in anything another process persisted, so new
+        vector IDs continue after theirs and the save builds on the latest version.
+        """
+        with self._lock:
+            outer = self._write_depth == 0
+            if outer:
+                self._lock_handle = _lock_exclusive(self.lock_path)
+            self._write_depth += 1
+            try:
+                if outer:
+                    self._catch_up()
+                yield
+            finally:
+                self._write_depth -= 1
+                if outer:
+                    _unlock(self._lock_handle)
+                    self._lock_handle = None
+
+    def _catch_up(self) -> None:
+        if _file_id(self.meta_path) != self._meta_id:
+            self._reset()
+            return
+        manifest = read_manifest(self.manifest_path)
+        if manifest is not None and manifest["version"] != self.version:
+            self._swap(manifest, self._read_index(manifest))
+
+    def check_for_updates(self) -> bool:
+        """Stat the manifest and ``refresh()`` if another process rewrote it."""
+        if _file_id(self.meta_path) != self._meta_id:
+            with self._lock:
+                if self._write_depth or self._bulk_depth:
+                    return False
+                self._reset()
+            return True
+        stat = _stat_key(self.manifest_path)
+        if stat is None or stat == self._manifest_stat:
+            return False
+        self._manifest_stat = stat
+        return self.refresh()
+
+    def _read_index(self, manifest: Dict) -> Optional[faiss.Index]:
+        if manifest["empty"] or not self.index_path.exists():
+            return None
+        index = faiss.read_index(str(self.index_path))
+        apply_search_params(index, settings.ivf_nprobe, settings.hnsw_ef_search)
+        return index
+
+    def refresh(self) -> bool:
+        """Swap in a newer index persisted by another process; returns whether it did.
+
+        The new index is read into a second buffer without holding the writer lock and then
+        swapped in with one assignment, so searches already running finish on the index
+        they started with. Listeners are told exactly which sources changed in between.
+        """
+        manifest = read_manifest(self.manifest_path)
+        if manifest is None or manifest["version"] == self.version:
+            return False
+        index = self._read_index(manifest)
+        with self._lock:
+            # A write in progress catches up on its own when it starts; never swap under it.
+            if self._write_depth or self._bulk_depth or self._dirty or manifest["version"] == self.version:
+                return False
+            self._swap(manifest, index)
+        return True
+
+    def _swap(self, manifest: Dict, index: Optional[faiss.Index]) -> None:
+        since = self.version
+        before = set(self.sources)
+        self.index, self.version = index, manifest["version"]
+        self._next_id = max(self._next_id, manifest["next_id"])
+        self.metadata.refresh()
+        changes = manifest["changes"]
+        self._changed_sources = {name for version, names in changes if version > since for name in names}
+        if manifest["version"] < since or not changes or changes[0][0] > since + 1:
+            # The counter restarted, or older changes fell out of the history: treat every source as changed.
+            self._changed_sources.update(before | set(self.sources))
+        self._manifest_stat = _stat_key(self.manifest_path)
+        logger.info("Swapped in index version %d (was %d)", self.version, since)
+        self._notify_changes()
+
+    def _reset(self) -> None:
+        """Reopen a store whose files were deleted and recreated (e.g. the ingest page's wipe)."""
+        before = set(self.sources)
+        logger.info("%s was replaced on disk; reloading the vector store", self.meta_path)
+        # The old connection is left to close once searches still reading it let go.
+        self.metadata = MetadataStore(self.meta_path)
+        self._meta_id = _file_id(self.meta_path)
+        self._load()
+        self._changed_sources = before | set(self.sources)
+        self._notify_changes()
+
+    def on_sources_changed(self, callback: Callable[[Set[str]], None]) -> None:
+        """Call ``callback(source_names)`` after each persist that added or removed chunks of those sources."""
+        self._listeners.append(callback)
+
+    def _notify_changes(self) -> None:
+        changed, self._changed_sources = self._changed_sources, set()
+        if not changed:
             return
-        faiss.write_index(self.index, str(self.index_path))
-        with self.meta_path.open("w") as f:
-            json.dump(self.metadata, f)
+        for callback in self._listeners:
+            try:
+                callback(changed)
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Source change listener failed")
+
+    def clear(self) -> None:
+        """Drop every chunk and delete the persisted index."""
+        with self._writing():
+            self._pending_texts, self._pending_metadatas = [], []
+            self._changed_sources.update(self.sources)
+            self.index = None
+            self._save()
+
+    def _persist(self) -> None:
+        if self._bulk_depth:
+            self._dirty = True
+        else:
+            self._save()
+
+    @contextmanager
+    def bulk(self) -> Iterator["VectorStore"]:
+        """Buffer add_texts/remove_source calls and embed + persist once on exit.
+
+        If the block raises, in-memory changes are discarded by reloading from disk.
+        """
+        with self._writing():
+            self._bulk_depth += 1
+            try:
+                yield self
+            except BaseException:
+                self._bulk_depth -= 1
+                if not self._bulk_depth:
+                    logger.warning("Bulk write aborted; reloading %s", self.index_path)
+                    self._load()
+                raise
+            self._bulk_depth -= 1
+            if not self._bulk_depth:
+                self.flush()
+
+    def flush(self) -> None:
+        """Embed any buffered texts and persist pending changes."""
+        with self._writing():
+            self._embed_pending()
+            if self._dirty:
+                self._maybe_rebuild()
+                self._save()
+                self._dirty = False
 
     @staticmethod
     def _normalize(vectors: np.ndarray) -> np.ndarray:
         norms = np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-10
         return vectors / norms
 
+    @property
+    def tombstones(self) -> int:
+        """Vectors still in the index whose chunks were removed (HNSW cannot delete in place)."""
+        return self.index.ntotal - len(self.metadata) if self.index is not None else 0
+
+    def _target_kind(self) -> str:
+        return choose_kind(settings.index_kind, settings.ann_index_kind, len(self.metadata), settings.ann_threshold)
+
+    def _live_vectors(self) -> Tuple[np.ndarray, np.ndarray]:
+        ids = self.metadata.all_ids()
+        return self.index.reconstruct_batch(ids), ids
+
+    def _rebuild(self, kind: str) -> None:
+        """Rebuild the index as ``kind`` from the stored vectors, dropping tombstones."""
+        vectors, ids = self._live_vectors()
+        index = build_index(kind, vectors.shape[1], vectors)
+        index.add_with_ids(vectors, ids)
+        apply_search_params(index, settings.ivf_nprobe, settings.hnsw_ef_search)
+        logger.info("Rebuilt %s index as %s with %d vectors", index_kind(self.index), index_kind(index), len(ids))
+        self.index = index
+
+    def _maybe_rebuild(self) -> None:
+        if self.index is None or not self.metadata:
+            return
+        target = self._target_kind()
+        current = index_kind(self.index)
+        upgrade_only = settings.index_kind == "auto" and current != "flat"
+        if target != current and not upgrade_only and can_build(target, len(self.metadata)):
+            # Under "auto" we only ever upgrade flat -> ANN; an ANN index is never downgraded.
+            self._rebuild(target)
+            if target != "flat":
+                self.recall_report()
+        elif self.tombstones > 0.2 * self.index.ntotal or needs_retrain(self.index, len(self.metadata)):
+            # Also retrains IVF centroids that were fitted on a much smaller first batch.
+            self._rebuild(current)
+
     def add_texts(self, texts: List[str], metadatas: List[Dict]) -> int:
-        vectors = self.embedder.embed(texts)
-        vectors = self._normalize(vectors)
+        with self._writing():
+            if not self._bulk_depth:
+                self._add_vectors(texts, metadatas)
+                self._maybe_rebuild()
+                self._save()
+                return len(texts)
+            self._pending_texts.extend(texts)
+            self._pending_metadatas.extend(metadatas)
+            if len(self._pending_texts) >= _PENDING_EMBED_LIMIT:
+                self._embed_pending()
+            return len(texts)
+
+    def _embed_pending(self) -> None:
+        if not self._pending_texts:
+            return
+        texts, metadatas = self._pending_texts, self._pending_metadatas
+        self._pending_texts, self._pending_metadatas = [], []
+        self._add_vectors(texts, metadatas)
+        self._dirty = True
+
+    def add_embeddings(self, metadatas: List[Dict], vectors: np.ndarray) -> int:
+        """Add chunks whose vectors were computed by the caller (e.g. a pipelined embed stage)."""
+        with self._writing():
+            self._insert(metadatas, self._normalize(vectors))
+            if self._bulk_depth:
+                self._dirty = True
+            else:
+                self._maybe_rebuild()
+                self._save()
+            return len(metadatas)
+
+    def _add_vectors(self, texts: List[str], metadatas: List[Dict]) -> None:
+        self._insert(metadatas, self._normalize(self.embedder.embed(texts)))
+
+    def _insert(self, metadatas: List[Dict], vectors: np.ndarray) -> None:
+        manifest = self._check_latest()
+        if manifest is not None:
+            self._next_id = max(self._next_id, manifest["next_id"])
         if self.index is None:
-            dim = vectors.shape[1]
-            self.index = faiss.IndexFlatIP(dim)
-        self.index.add(vectors)
-        self.metadata.extend(metadatas)
-        self._save()
-        return len(texts)
+            kind = choose_kind(settings.index_kind, settings.ann_index_kind, len(vectors), settings.ann_threshold)
+            self.index = build_index(kind, vectors.shape[1], vectors)
+            apply_search_params(self.index, settings.ivf_nprobe, settings.hnsw_ef_search)
+        ids = np.arange(self._next_id, self._next_id + len(vectors), dtype="int64")
+        self._next_id += len(vectors)
+        self.index.add_with_ids(vectors, ids)
+        self.metadata.add(ids.tolist(), metadatas)
+        self._changed_sources.update(meta.get("source", "") for meta in metadatas)
 
-    def remove_source(self, source_name: str) -> int:
-        """Remove all chunks from a given source and rebuild the index."""
-        original_count = len(self.metadata)
-        remaining = [m for m in self.metadata if m.get("source") != source_name]
-        removed = original_count - len(remaining)
-        if removed == 0:
-            return 0
-        # Rebuild index from remaining metadata/text
-        self.metadata = remaining
-        if not remaining:
+    def _drop_vectors(self, ids: List[int]) -> None:
+        """Drop ``ids`` from the index after their metadata rows were deleted."""
+        if not self.metadata:
             self.index = None
-            self._save()
-            return removed
-        texts = [m.get("text", "") for m in remaining]
-        vectors = self._normalize(self.embedder.embed(texts))
-        dim = vectors.shape[1]
-        self.index = faiss.IndexFlatIP(dim)
-        self.index.add(vectors)
-        self._save()
-        return removed
+        elif supports_removal(self.index):
+            self.index.remove_ids(np.asarray(ids, dtype="int64"))
+        else:
+            self._maybe_rebuild()
+
+    def remove_source(self, source_name: str) -> int:
+        """Remove all chunks from a given source without re-embedding the rest."""
+        with self._writing():
+            # Flush buffered chunks first so the source's pending texts are removed too.
+            self._embed_pending()
+            ids = self.metadata.remove_source(source_name)
+            if not ids:
+                return 0
+            self._changed_sources.add(source_name)
+            self._drop_vectors(ids)
+            self._persist()
+            return len(ids)
+
+    def source_hash(self, source_name: str) -> Optional[str]:
+        """Content hash of the document last ingested as ``source_name``, if any."""
+        return self.metadata.source_hash(source_name)
+
+    def stored_chunks(self, source_name: str) -> Tuple[Dict[str, List[int]], List[int]]:
+        """Stored vector IDs of ``source_name`` grouped by chunk hash, plus unhashed IDs."""
+        stored: Dict[str, List[int]] = {}
+        unhashed: List[int] = []
+        for vid, chunk_hash in self.metadata.chunk_hashes(source_name):
+            if chunk_hash:
+                stored.setdefault(chunk_hash, []).append(vid)
+            else:
+                # Ingested before chunk hashing existed; replace it.
+                unhashed.append(vid)
+        return stored, unhashed
+
+    def diff_source(self, source_name: str, metadatas: List[Dict]) -> SourceDiff:
+        """Match new chunks to stored ones by ``chunk_hash`` (a multiset diff)."""
+        stored, unhashed = self.stored_chunks(source_name)
+        diff = SourceDiff(source_name, stale=unhashed)
+        diff.match(stored, metadatas)
+        diff.stale.extend(vid for ids in stored.values() for vid in ids)
+        return diff
+
+    def apply_diff(self, doc_hash: Optional[str], diff: SourceDiff, vectors: Optional[np.ndarray] = None) -> None:
+        """Apply ``diff``; ``vectors`` are the embeddings of ``diff.new`` in order.
+
+        ``doc_hash`` is recorded for the source once its last diff is applied.
+        """
+        with self._writing():
+            self._embed_pending()
+            if diff.stale:
+                self.metadata.delete_ids(diff.stale)
+                self._drop_vectors(diff.stale)
+            if diff.kept:
+                # Unchanged text may have moved to another page or position.
+                self.metadata.update_provenance(diff.kept)
+            if diff.new:
+                self._insert(diff.new, self._normalize(vectors))
+            if doc_hash is not None:
+                self.metadata.set_source_hash(diff.source, doc_hash)
+            self._changed_sources.add(diff.source)
+            if self._bulk_depth:
+                self._dirty = True
+            else:
+                self._maybe_rebuild()
+                self._save()
+
+    def sync_source(
+        self, source_name: str, doc_hash: str, batches: Iterable[List[Dict]]
+    ) -> Optional[Dict[str, int]]:
+        """Bring ``source_name`` in line with a freshly chunked document, one batch at a time.
+
+        Returns ``None`` when the document hash is unchanged. Otherwise each batch is matched
+        against the stored chunk hashes and only its new texts are embedded before the next
+        batch is pulled, so memory is bounded by the batch size; whatever was not matched by
+        the end is dropped. Everything commits as one transaction.
+        """
+        with self._writing():
+            if self.metadata.source_hash(source_name) == doc_hash:
+                return None
+            stored, unhashed = self.stored_chunks(source_name)
+            counts = {"new": 0, "kept": 0, "removed": 0}
+            with self.bulk():
+                for batch in batches:
+                    diff = SourceDiff(source_name)
+                    diff.match(stored, batch)
+                    vectors = self.embedder.embed([meta["text"] for meta in diff.new]) if diff.new else None
+                    self.apply_diff(None, diff, vectors)
+                    counts["new"] += len(diff.new)
+                    counts["kept"] += len(diff.kept)
+                diff = SourceDiff(source_name, stale=unhashed + [vid for ids in stored.values() for vid in ids])
+                self.apply_diff(doc_hash, diff)
+                counts["removed"] = len(diff.stale)
+            return counts
 
     def reload(self) -> None:
         """Reload index and metadata from disk."""
-        self._load()
+        with self._lock:
+            self._load()
+
+    def embed_query(self, query: str) -> np.ndarray:
+        """Normalized float32 embedding of ``query`` with shape (1, dim); read-only when cached."""
+        cached = self.query_cache.get(query)
+        if cached is not None:
+            return cached
+        return self.embed_queries([query])
+
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        """Normalized (n, dim) embeddings; cache misses are embedded in a single batch."""
+        vectors: List[Optional[np.ndarray]] = [self.query_cache.get(query) for query in queries]
+        missing: Dict[str, List[int]] = {}
+        for pos, vector in enumerate(vectors):
+            if vector is None:
+                missing.setdefault(QueryCache.key(queries[pos]), []).append(pos)
+        if missing:
+            positions = list(missing.values())
+            fresh = self._normalize(self.embedder.embed([queries[group[0]] for group in positions]))
+            for group, vector in zip(positions, fresh):
+                self.query_cache.put(queries[group[0]], vector[None, :])
+                for pos in group:
+                    vectors[pos] = vector[None, :]
+        return np.vstack(vectors).astype("float32", copy=False)
+
+    def embed_query_within(self, query: str, timeout: float) -> Optional[np.ndarray]:
+        """``embed_query`` bounded by ``timeout`` seconds; None if the embedder is down or slow.
+
+        A timed-out embedding keeps running in the background (and still fills the cache).
+        """
+        if not self.embedder.available():
+            logger.warning("No embedding provider available; skipping query embedding")
+            return None
+        future = _query_pool.submit(contextvars.copy_context().run, self.embed_query, query)
+        try:
+            return future.result(timeout=timeout)
+        except FuturesTimeout:
+            logger.warning("Query embedding took longer than %.1fs; skipping it", timeout)
+        except Exception:  # pylint: disable=broad-except
+            logger.exception("Query embedding failed")
+        return None
+
+    @staticmethod
+    def _dense_candidates(index: faiss.Index, query_vec: np.ndarray, fetch_k: int) -> List[Tuple[int, float]]:
+        with tracing.span("faiss.search", queries=1, k=fetch_k):
+            scores, idxs = index.search(query_vec, fetch_k)
+        return [(int(idx), float(score)) for score, idx in zip(scores[0], idxs[0]) if idx >= 0 and score > 0]
+
+    def _materialize(self, candidates: List[Tuple[int, float]]) -> List[Tuple[Dict, float]]:
+        # Only the candidate rows are read from the metadata store.
+        rows = self.metadata.get_many([vid for vid, _ in candidates])
+        return [(rows[vid], score) for vid, score in candidates if vid in rows]
 
     def search(self, query: str, top_k: int = 4) -> List[Tuple[Dict, float]]:
-        if self.index is None or not self.metadata:
+        return self.search_many([query], top_k)[0]
+
+    def search_many(
+        self, queries: List[str], top_k: int = 4, min_score: float = 0.0
+    ) -> List[List[Tuple[Dict, float]]]:
+        """Dense top-k hits for each query with one embed batch and one ``index.search``.
+
+        Hits scoring at or below zero or under ``min_score`` are masked out in numpy, and the
+        metadata for every query's survivors is fetched in a single lookup.
+        """
+        # One read of self.index: a concurrent refresh() swaps the reference, never the object.
+        index = self.index
+        if index is None or not self.metadata or not queries:
+            return [[] for _ in queries]
+        query_vecs = self.embed_queries(queries)
+        # Over-fetch while tombstones are present so removed chunks don't shrink the result set.
+        fetch_k = top_k * 3 if self.tombstones else top_k
+        with tracing.span("faiss.search", queries=len(queries), k=fetch_k):
+            scores, idxs = index.search(query_vecs, fetch_k)
+        keep = (idxs >= 0) & (scores > 0) & (scores >= min_score)
+        rows = self.metadata.get_many(np.unique(idxs[keep]).tolist())
+        results: List[List[Tuple[Dict, float]]] = []
+        for row_ids, row_scores, row_keep in zip(idxs, scores, keep):
+            hits = [
+                (rows[vid], score)
+                for vid, score in zip(row_ids[row_keep].tolist(), row_scores[row_keep].tolist())
+                if vid in rows
+            ]
+            results.append(hits[:top_k])
+        return results
+
+    def _lexical_ids(self, query: str, limit: int) -> List[int]:
+        match = fts_query(query)
+        if not match:
+            return []
+        with tracing.span("bm25.search", k=limit) as span:
+            ids = [vid for vid, _ in self.metadata.lexical_search(match, limit)]
+            span.set(hits=len(ids))
+        return ids
+
+    def lexical_search(self, query: str, top_k: int = 4) -> List[Tuple[Dict, float]]:
+        """BM25 hits, scored by query-term coverage (0-1) so score thresholds still mean something."""
+        if not self.metadata:
+            return []
+        hits = self._materialize([(vid, 0.0) for vid in self._lexical_ids(query, top_k)])
+        return [(meta, term_coverage(query, meta["text"])) for meta, _ in hits]
+
+    def hybrid_search(self, query: str, top_k: int = 4) -> List[Tuple[Dict, float]]:
+        """Reciprocal-rank fusion of dense and BM25 candidates.
+
+        Fused hits carry their cosine similarity. If the query cannot be embedded within
+        QUERY_EMBED_TIMEOUT (or no embedder is up) the BM25 hits are returned on their own.
+        """
+        index = self.index
+        if index is None or not self.metadata:
             return []
-        query_vec = self.embedder.embed([query])
-        query_vec = self._normalize(query_vec)
-        scores, idxs = self.index.search(query_vec, top_k)
-        hits: List[Tuple[Dict, float]] = []
-        for score, idx in zip(scores[0], idxs[0]):
-            if idx >= len(self.metadata) or score <= 0:
-                continue
-            hits.append((self.metadata[idx], float(score)))
-        return hits
+        if not self.metadata.has_fts:
+            return self.search(query, top_k)
+        fetch_k = max(top_k * 4, 20)
+        lexical = self._lexical_ids(query, fetch_k)
+        query_vec = self.embed_query_within(query, settings.query_embed_timeout)
+        if query_vec is None:
+            logger.info("Answering %r from the lexical index only", query[:80])
+            return self.lexical_search(query, top_k)
+        dense = self._dense_candidates(index, query_vec, fetch_k)
+        scores = dict(dense)
+        hits: List[Tuple[int, float]] = []
+        for vid in rrf_fuse([[vid for vid, _ in dense], lexical]):
+            if vid not in scores:
+                # BM25-only candidates get their exact cosine, so SCORE_THRESHOLD applies uniformly.
+                vector = self._reconstruct(index, vid)
+                if vector is None:
+                    continue
+                scores[vid] = float(vector @ query_vec[0])
+            hits.append((vid, scores[vid]))
+            if len(hits) == top_k:
+                break
+        return self._materialize(hits)
+
+    @staticmethod
+    def _reconstruct(index: faiss.Index, vid: int) -> Optional[np.ndarray]:
+        # The shared metadata can be ahead of this process's index (another writer, or a
+        # hot reload not swapped in yet); such BM25 hits have no vector here and are skipped.
+        try:
+            return index.reconstruct(int(vid))
+        except RuntimeError:
+            return None
+
+    def recall_report(self, k: int = 10, n_queries: int = 100) -> Dict:
+        """Measure recall@k of the active index against an exact flat search.
+
+        Queries are sampled from the stored chunk vectors, so no embedding calls are made.
+        """
+        if self.index is None or not self.metadata:
+            return {}
+        vectors, ids = self._live_vectors()
+        rng = np.random.default_rng(0)
+        sample = rng.choice(len(ids), size=min(n_queries, len(ids)), replace=False)
+        k = min(k, len(ids))
+        if self.tombstones:
+            # Tombstoned vectors would count as misses; compare on the live set only.
+            index = build_index(index_kind(self.index), vectors.shape[1], vectors)
+            index.add_with_ids(vectors, ids)
+            apply_search_params(index, settings.ivf_nprobe, settings.hnsw_ef_search)
+        else:
+            index = self.index
+        report = recall_at_k(index, vectors, ids, vectors[sample], k)
+        logger.info("Index recall report: %s", report)
+        return report
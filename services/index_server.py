@@ -0,0 +1,165 @@
+"""Standalone index service: one process per host owns the FAISS index and metadata.
+
+Usage: python -m services.index_server [--host 127.0.0.1] [--port 8765] [--store PATH]
+
+App replicas set INDEX_SERVICE_URL and talk to it through ``rag.remote_store.RemoteVectorStore``
+instead of each loading the index into memory. Requests and responses are JSON over HTTP.
+"""
+import argparse
+import json
+import logging
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from config.logging_config import setup_logging
+from config.settings import settings
+from rag.remote_store import decode_array, encode_array
+from rag.vector_store import SourceDiff, VectorStore
+from services import tracing
+
+logger = logging.getLogger(__name__)
+
+# Source changes kept for replicas polling /changes; older pollers are told to drop everything.
+CHANGE_LOG_SIZE = 256
+
+
+class IndexService:
+    """The operations behind each endpoint, on top of one shared VectorStore."""
+
+    def __init__(self, store: VectorStore) -> None:
+        self.store = store
+        self.changes = 0
+        self._log: Deque[Tuple[int, Set[str]]] = deque(maxlen=CHANGE_LOG_SIZE)
+        self._lock = threading.Lock()
+        store.on_sources_changed(self._record_change)
+
+    def _record_change(self, sources: Set[str]) -> None:
+        with self._lock:
+            self.changes += 1
+            self._log.append((self.changes, set(sources)))
+
+    def changed_since(self, since: int) -> Optional[List[str]]:
+        with self._lock:
+            if since < self.changes - len(self._log):
+                return None
+            return sorted({name for change, sources in self._log if change > since for name in sources})
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "version": self.store.version,
+            "changes": self.changes,
+            "chunks": len(self.store.metadata),
+            "has_fts": self.store.metadata.has_fts,
+        }
+
+    def routes(self) -> Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]]:
+        store = self.store
+        return {
+            "/search_many": lambda p: {
+                "results": store.search_many(p["queries"], p.get("top_k", 4), p.get("min_score", 0.0))
+            },
+            "/hybrid_search": lambda p: {"hits": store.hybrid_search(p["query"], p.get("top_k", 4))},
+            "/lexical_search": lambda p: {"hits": store.lexical_search(p["query"], p.get("top_k", 4))},
+            "/embed_queries": lambda p: {"vectors": encode_array(store.embed_queries(p["queries"]))},
+            "/embed_query_within": lambda p: {
+                "vector": encode_array(store.embed_query_within(p["query"], p["within"]))
+            },
+            "/add_embeddings": lambda p: {
+                "added": store.add_embeddings(p["metadatas"], decode_array(p["vectors"]))
+            },
+            "/remove_source": lambda p: {"removed": store.remove_source(p["source"])},
+            "/source_hash": lambda p: {"hash": store.source_hash(p["source"])},
+            "/stored_chunks": lambda p: dict(zip(("stored", "unhashed"), store.stored_chunks(p["source"]))),
+            "/diff_source": lambda p: vars(store.diff_source(p["source"], p["metadatas"])),
+            "/apply_diff": self._apply_diff,
+            "/clear": lambda p: store.clear() or {},
+            "/reload": lambda p: store.reload() or {},
+        }
+
+    def _apply_diff(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        diff = SourceDiff(
+            payload["source"],
+            payload["new"],
+            [(int(vid), meta) for vid, meta in payload["kept"]],
+            payload["stale"],
+        )
+        self.store.apply_diff(payload["doc_hash"], diff, decode_array(payload["vectors"]))
+        return {}
+
+
+def make_handler(service: IndexService) -> type:
+    routes = service.routes()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _reply(self, status: int, body: Dict[str, Any]) -> None:
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self) -> None:  # noqa: N802 - http.server naming
+            url = urlparse(self.path)
+            if url.path == "/info":
+                self._reply(200, service.info())
+            elif url.path == "/sources":
+                self._reply(200, {"sources": service.store.sources})
+            elif url.path == "/changes":
+                since = int(parse_qs(url.query).get("since", ["0"])[0])
+                self._reply(200, {"changes": service.changes, "sources": service.changed_since(since)})
+            elif url.path == "/metrics":
+                data = tracing.metrics_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            else:
+                self._reply(404, {"error": f"unknown path {url.path}"})
+
+        def do_POST(self) -> None:  # noqa: N802 - http.server naming
+            route = routes.get(self.path)
+            if route is None:
+                self._reply(404, {"error": f"unknown path {self.path}"})
+                return
+            try:
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                with tracing.span(f"index_service{self.path.replace('/', '.')}"):
+                    self._reply(200, route(payload))
+            except Exception as exc:  # pylint: disable=broad-except
+                logger.exception("Index service request %s failed", self.path)
+                self._reply(500, {"error": str(exc)})
+
+        def log_message(self, format: str, *args: Any) -> None:  # pylint: disable=redefined-builtin
+            logger.debug("%s - %s", self.address_string(), format % args)
+
+    return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve one shared vector index to every app process on this host")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--store", type=Path, default=settings.vector_store_path)
+    args = parser.parse_args()
+    setup_logging()
+    service = IndexService(VectorStore(args.store))
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(service))
+    logger.info("Index service for %s listening on http://%s:%d", args.store, args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
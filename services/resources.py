@@ -1,16 +1,26 @@
-from typing import Optional
+from typing import Optional, Union
 
 import streamlit as st
 
 from config.settings import settings
 from llm.client import LLMRouter
+from rag.answer_cache import AnswerCache
+from rag.remote_store import RemoteVectorStore
+from rag.single_flight import AnswerCoalescer
 from rag.vector_store import VectorStore
+from services import tracing
 
-_store: Optional[VectorStore] = None
+_store: Optional[Union[VectorStore, RemoteVectorStore]] = None
 _llm: Optional[LLMRouter] = None
+_answer_cache: Optional[AnswerCache] = None
+_coalescer: Optional[AnswerCoalescer] = None
 
 
-def _build_store() -> VectorStore:
+def _build_store() -> Union[VectorStore, RemoteVectorStore]:
+    if settings.metrics_port:
+        tracing.start_metrics_server(settings.metrics_port, settings.metrics_host)
+    if settings.index_service_url:
+        return RemoteVectorStore(settings.index_service_url)
     return VectorStore(settings.vector_store_path)
 
 
@@ -18,16 +28,52 @@ def _build_llm() -> LLMRouter:
     return LLMRouter()
 
 
+def _build_answer_cache() -> Optional[AnswerCache]:
+    if settings.answer_cache_size <= 0:
+        return None
+    cache = AnswerCache(settings.answer_cache_size, settings.answer_cache_ttl, settings.answer_cache_threshold)
+    # Re-ingesting or removing a source drops every cached answer that cites it.
+    get_store().on_sources_changed(cache.invalidate_sources)
+    return cache
+
+
+def _build_coalescer() -> Optional[AnswerCoalescer]:
+    global _coalescer
+    if not settings.coalesce_answers:
+        return None
+    # Remembered so clear_resources() can stop its workers when the cache drops it.
+    _coalescer = AnswerCoalescer(get_store(), get_llm(), get_answer_cache())
+    return _coalescer
+
+
+def clear_resources() -> None:
+    """Drop every cached resource so the next call builds fresh ones."""
+    global _store, _llm, _answer_cache, _coalescer
+    if _coalescer is not None:
+        _coalescer.close()
+    _store = _llm = _answer_cache = _coalescer = None
+    if hasattr(st, "cache_resource"):
+        st.cache_resource.clear()
+
+
 if hasattr(st, "cache_resource"):
     @st.cache_resource
-    def get_store() -> VectorStore:
+    def get_store() -> Union[VectorStore, RemoteVectorStore]:
         return _build_store()
 
     @st.cache_resource
     def get_llm() -> LLMRouter:
         return _build_llm()
+
+    @st.cache_resource
+    def get_answer_cache() -> Optional[AnswerCache]:
+        return _build_answer_cache()
+
+    @st.cache_resource
+    def get_coalescer() -> Optional[AnswerCoalescer]:
+        return _build_coalescer()
 else:  # pragma: no cover - fallback for non-Streamlit usage
-    def get_store() -> VectorStore:
+    def get_store() -> Union[VectorStore, RemoteVectorStore]:
         global _store
         if _store is None:
             _store = _build_store()
@@ -38,3 +84,15 @@ else:  # pragma: no cover - fallback for non-Streamlit usage
         if _llm is None:
             _llm = _build_llm()
         return _llm
+
+    def get_answer_cache() -> Optional[AnswerCache]:
+        global _answer_cache
+        if _answer_cache is None:
+            _answer_cache = _build_answer_cache()
+        return _answer_cache
+
+    def get_coalescer() -> Optional[AnswerCoalescer]:
+        global _coalescer
+        if _coalescer is None:
+            _coalescer = _build_coalescer()
+        return _coalescer
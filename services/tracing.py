@@ -0,0 +1,328 @@
+"""Lightweight spans and Prometheus-style metrics.
+
+``span(name, **attrs)`` times a block and nests under the current span (tracked in a
+contextvar). Every finished span feeds the ``hrbot_span_seconds`` histogram; a finished
+root span is appended as one JSON line to ``TRACE_DIR/traces-YYYYMMDD.jsonl`` when that
+is set. With TRACING disabled, ``span`` returns a shared no-op object and the metric
+helpers return immediately, so instrumented code pays one attribute check.
+"""
+import contextvars
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+RATE_BUCKETS = (1, 5, 10, 20, 50, 100, 200, 500)
+
+_current: "contextvars.ContextVar[Optional[Span]]" = contextvars.ContextVar("hrbot_span", default=None)
+
+
+class _State:
+    enabled = settings.tracing
+    trace_dir: Optional[Path] = settings.trace_dir
+
+
+_state = _State()
+_write_lock = threading.Lock()
+
+
+def configure(enabled: bool, trace_dir: Optional[Path] = None) -> None:
+    _state.enabled = enabled
+    _state.trace_dir = trace_dir
+
+
+def enabled() -> bool:
+    return _state.enabled
+
+
+class _Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...]) -> None:
+        self.name = name
+        self.help = help_text
+        self.buckets = buckets
+        self._series: Dict[Tuple[Tuple[str, str], ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, labels: Dict[str, str]) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            # Per-bucket counts, then sum and count; values past the last bound only land in +Inf.
+            series = self._series.setdefault(key, [0.0] * (len(self.buckets) + 2))
+            slot = bisect_left(self.buckets, value)
+            if slot < len(self.buckets):
+                series[slot] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(key, list(series)) for key, series in self._series.items()]
+        for key, series in items:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(key, le=_fmt(bound))} {_fmt(cumulative)}")
+            lines.append(f"{self.name}_bucket{_labels(key, le='+Inf')} {_fmt(series[-1])}")
+            lines.append(f"{self.name}_sum{_labels(key)} {series[-2]:.6f}")
+            lines.append(f"{self.name}_count{_labels(key)} {_fmt(series[-1])}")
+        return lines
+
+
+class _Counter:
+    def __init__(self, name: str, help_text: str) -> None:
+        self.name = name
+        self.help = help_text
+        self._series: Dict[Tuple[Tuple[str, str], ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float, labels: Dict[str, str]) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._series[key] = self._series.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = list(self._series.items())
+        lines.extend(f"{self.name}{_labels(key)} {_fmt(value)}" for key, value in items)
+        return lines
+
+
+class _Gauge(_Counter):
+    def set(self, value: float, labels: Dict[str, str]) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._series[key] = value
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+def _fmt(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+def _labels(key: Tuple[Tuple[str, str], ...], **extra: str) -> str:
+    pairs = list(key) + list(extra.items())
+    if not pairs:
+        return ""
+    body = ",".join(f'{name}="{str(value)}"'.replace("\n", " ") for name, value in pairs)
+    return "{" + body + "}"
+
+
+_histograms: Dict[str, _Histogram] = {
+    "span": _Histogram("hrbot_span_seconds", "Duration of traced stages", DEFAULT_BUCKETS),
+    "ttft": _Histogram("hrbot_llm_ttft_seconds", "Time to first streamed token per LLM provider", DEFAULT_BUCKETS),
+    "queue_wait": _Histogram("hrbot_answer_queue_wait_seconds", "Time answers waited for a generation slot", DEFAULT_BUCKETS),
+    "chunk_rate": _Histogram(
+        "hrbot_llm_chunks_per_second", "Streamed chunks per second after the first", RATE_BUCKETS
+    ),
+}
+_counters: Dict[str, _Counter] = {
+    "llm": _Counter("hrbot_llm_requests_total", "LLM calls by provider and outcome"),
+    "embed": _Counter("hrbot_embed_texts_total", "Texts embedded by provider"),
+    "errors": _Counter("hrbot_span_errors_total", "Traced stages that raised"),
+    "answers": _Counter("hrbot_answer_requests_total", "Answer requests by admission outcome"),
+}
+_gauges: Dict[str, _Gauge] = {
+    "queue_depth": _Gauge("hrbot_answer_queue_depth", "Answer generations waiting for a slot"),
+    "active": _Gauge("hrbot_answer_active", "Answer generations running"),
+}
+
+
+def observe(metric: str, value: float, **labels: str) -> None:
+    if _state.enabled:
+        _histograms[metric].observe(value, labels)
+
+
+def increment(metric: str, amount: float = 1, **labels: str) -> None:
+    if _state.enabled:
+        _counters[metric].inc(amount, labels)
+
+
+def set_gauge(metric: str, value: float, **labels: str) -> None:
+    if _state.enabled:
+        _gauges[metric].set(value, labels)
+
+
+class Span:
+    __slots__ = ("name", "attrs", "start", "duration", "children", "parent", "_token", "_wall")
+
+    def __init__(self, name: str, attrs: Dict[str, Any]) -> None:
+        self.name = name
+        self.attrs = attrs
+        self.start = 0.0
+        self.duration = 0.0
+        self.children: List["Span"] = []
+        self.parent: Optional[Span] = None
+        self._token: Optional[contextvars.Token] = None
+        self._wall = 0.0
+
+    def set(self, **attrs: Any) -> None:
+        self.attrs.update(attrs)
+
+    def __enter__(self) -> "Span":
+        self.parent = _current.get()
+        if self.parent is not None:
+            self.parent.children.append(self)
+        self._token = _current.set(self)
+        self._wall = time.time()
+        self.start = time.perf_counter()
+        return self
+
+    def detach(self) -> None:
+        """Stop being the current span without finishing; close it later with ``__exit__``."""
+        if self._token is not None:
+            try:
+                _current.reset(self._token)
+            except ValueError:
+                # Exited from another context (e.g. a generator closed elsewhere).
+                _current.set(self.parent)
+            self._token = None
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        self.duration = time.perf_counter() - self.start
+        self.detach()
+        if exc_type is not None and exc_type is not GeneratorExit:
+            self.attrs["error"] = f"{exc_type.__name__}: {exc}"
+            _counters["errors"].inc(1, {"span": self.name})
+        _histograms["span"].observe(self.duration, {"span": self.name})
+        if self.parent is None:
+            _export(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "start": round(self._wall, 6),
+            "ms": round(self.duration * 1000, 3),
+            "attrs": self.attrs,
+            "children": [child.to_dict() for child in self.children],
+        }
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, **attrs: Any) -> None:
+        pass
+
+    def detach(self) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name: str, **attrs: Any) -> Any:
+    """Context manager timing ``name``; attributes can be added later with ``.set()``."""
+    if not _state.enabled:
+        return _NOOP
+    return Span(name, attrs)
+
+
+def current() -> Optional[Span]:
+    return _current.get()
+
+
+def traced_stream(stream: Iterator[T], parent: Any, finish: bool = False) -> Iterator[T]:
+    """Iterate ``stream`` with ``parent`` as the current span, so lazily started spans nest.
+
+    With ``finish=True`` the (detached) ``parent`` is closed once the stream ends, which
+    lets a request span cover answer streaming that outlives the call that returned it.
+    """
+    if not isinstance(parent, Span):
+        yield from stream
+        return
+    error: Optional[BaseException] = None
+    try:
+        while True:
+            token = _current.set(parent)
+            try:
+                item = next(stream)
+            except StopIteration:
+                return
+            finally:
+                _current.reset(token)
+            yield item
+    except BaseException as exc:
+        error = exc
+        raise
+    finally:
+        if finish:
+            parent.__exit__(type(error) if error else None, error, None)
+
+
+def _export(root: Span) -> None:
+    if _state.trace_dir is None:
+        return
+    try:
+        _state.trace_dir.mkdir(parents=True, exist_ok=True)
+        path = _state.trace_dir / time.strftime("traces-%Y%m%d.jsonl")
+        line = json.dumps(root.to_dict(), default=str)
+        with _write_lock, path.open("a") as f:
+            f.write(line + "\n")
+    except Exception:  # pylint: disable=broad-except
+        logger.exception("Failed to write trace %s", root.name)
+
+
+def metrics_text() -> str:
+    """Prometheus text exposition of every metric."""
+    lines: List[str] = []
+    for metric in list(_histograms.values()) + list(_counters.values()) + list(_gauges.values()):
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:  # noqa: N802 - http.server naming
+        if self.path.rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:  # pylint: disable=redefined-builtin
+        pass
+
+
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1") -> None:
+    """Serve ``/metrics`` on ``host:port`` from a daemon thread; later calls are no-ops."""
+    global _server
+    with _server_lock:
+        if _server is not None or port <= 0:
+            return
+        try:
+            _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        except OSError:
+            logger.exception("Could not start the metrics server on %s:%d", host, port)
+            return
+        threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+        logger.info("Serving Prometheus metrics on %s:%d/metrics", host, port)
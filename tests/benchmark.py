@@ -0,0 +1,246 @@
+"""Offline latency/throughput benchmark for ingestion, search and answer streaming.
+
+Usage: python -m tests.benchmark [--sizes 1000,10000,100000] [--out results.json]
+
+Embeddings and the LLM are deterministic in-process stand-ins with configurable latency,
+so runs need no Ollama/Gemini and are comparable between commits. Each corpus size gets a
+fresh store in a temp directory; results are printed (and optionally written) as JSON.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import tempfile
+import time
+import zlib
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Tuple
+
+import numpy as np
+
+from config.logging_config import setup_logging
+from config.settings import settings
+from llm.client import BaseLLM, LLMRouter, ProviderStatus
+from llm.embeddings import EmbeddingProvider, EmbeddingRouter
+from rag.index_factory import index_kind
+from rag.retrieval import answer_question_stream
+from rag.vector_store import VectorStore
+
+HR_TERMS = (
+    "leave vacation pto sick parental maternity paternity bereavement benefits payroll salary bonus overtime "
+    "probation onboarding resignation notice termination harassment conduct dress remote attendance timesheet "
+    "reimbursement travel expenses appraisal review manager employee policy approval request days weeks"
+).split()
+
+
+@lru_cache(maxsize=None)
+def _bucket(word: str, dim: int) -> Tuple[int, float]:
+    # Signed feature hashing: bucket from the CRC, sign from its top bit.
+    crc = zlib.crc32(word.encode("utf-8"))
+    return crc % dim, 1.0 if crc & 0x80000000 else -1.0
+
+
+class FakeEmbeddings(EmbeddingProvider):
+    """Bag-of-words feature hashing: deterministic and similar for texts sharing words."""
+
+    name = "fake-embed"
+
+    def __init__(self, dim: int, latency_ms: float, per_text_ms: float) -> None:
+        self.dim = dim
+        self.latency = latency_ms / 1000
+        self.per_text = per_text_ms / 1000
+
+    def available(self) -> bool:
+        return True
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        time.sleep(self.latency + self.per_text * len(texts))
+        rows: List[int] = []
+        features: List[Tuple[int, float]] = []
+        for row, text in enumerate(texts):
+            buckets = [_bucket(word, self.dim) for word in text.lower().split()]
+            rows.extend([row] * len(buckets))
+            features.extend(buckets)
+        matrix = np.zeros((len(texts), self.dim), dtype="float32")
+        if features:
+            cols, signs = zip(*features)
+            np.add.at(matrix, (np.asarray(rows), np.asarray(cols)), np.asarray(signs, dtype="float32"))
+        return matrix
+
+
+class FakeLLM(BaseLLM):
+    name = "fake-llm"
+
+    def __init__(self, ttft_ms: float, token_ms: float, tokens: int = 40) -> None:
+        self.ttft = ttft_ms / 1000
+        self.token = token_ms / 1000
+        self.tokens = tokens
+
+    def available(self) -> ProviderStatus:
+        return ProviderStatus(self.name, True, "fake")
+
+    def generate(self, prompt: str) -> str:
+        return "".join(self.stream(prompt))
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        time.sleep(self.ttft)
+        for pos in range(self.tokens):
+            if pos:
+                time.sleep(self.token)
+            yield f"word{pos} "
+
+
+class Corpus:
+    """Zipf-distributed synthetic chunks over HR terms plus filler vocabulary."""
+
+    def __init__(self, seed: int, vocab_size: int = 5000) -> None:
+        self.rng = np.random.default_rng(seed)
+        self.vocab = np.array(HR_TERMS + [f"term{i}" for i in range(vocab_size)])
+        weights = 1.0 / np.arange(1, len(self.vocab) + 1)
+        self.probs = weights / weights.sum()
+        self.samples: List[str] = []
+
+    def batches(self, n: int, batch_size: int, sample_size: int) -> Iterator[List[str]]:
+        sample_every = max(n // sample_size, 1)
+        for start in range(0, n, batch_size):
+            count = min(batch_size, n - start)
+            lengths = self.rng.integers(48, 96, size=count)
+            words = self.rng.choice(len(self.vocab), size=(count, 96), p=self.probs)
+            texts = [" ".join(self.vocab[row[:length]]) for row, length in zip(words, lengths)]
+            self.samples.extend(texts[i] for i in range(0, count, sample_every))
+            yield texts
+
+    def questions(self, n: int, words: int = 32) -> List[str]:
+        """Question-like prefixes of sampled chunks, so most have a grounded answer."""
+        picks = self.rng.choice(len(self.samples), size=min(n, len(self.samples)), replace=False)
+        return [" ".join(self.samples[i].split()[:words]) + "?" for i in picks]
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {}
+    values = np.asarray(samples)
+    stats = {f"p{q}": round(float(np.percentile(values, q)), 3) for q in (50, 95, 99)}
+    stats["mean"] = round(float(values.mean()), 3)
+    return stats
+
+
+def _timed(fn: Callable[[], object]) -> float:
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) * 1000
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def run_size(n: int, args: argparse.Namespace) -> Dict:
+    tmp_dir = Path(tempfile.mkdtemp(prefix=f"hrbot_bench_{n}_"))
+    try:
+        embedder = EmbeddingRouter(
+            [FakeEmbeddings(args.dim, args.embed_latency_ms, args.embed_per_text_ms)], use_cache=False
+        )
+        llm = LLMRouter([FakeLLM(args.llm_ttft_ms, args.llm_token_ms)])
+        store = VectorStore(tmp_dir / "index.faiss", embedder=embedder)
+        corpus = Corpus(args.seed)
+        rss_before = _rss_mb()
+
+        start = time.perf_counter()
+        with store.bulk():
+            for texts in corpus.batches(n, 2048, args.queries * 2):
+                store.add_texts(texts, [{"source": f"doc{i % 100}.pdf", "text": text} for i, text in enumerate(texts)])
+        ingest_s = time.perf_counter() - start
+
+        questions = corpus.questions(args.queries)
+        search_cold = [_timed(lambda q=q: store.search(q, 3)) for q in questions]
+        search_cached = [_timed(lambda q=q: store.search(q, 3)) for q in questions]
+        hybrid = [_timed(lambda q=q: store.hybrid_search(q, 3)) for q in questions]
+        store.query_cache.clear()
+        batch_ms = _timed(lambda: store.search_many(questions, 3))
+
+        ttft: List[float] = []
+        grounded = 0
+        for question in questions[: args.answers]:
+            store.query_cache.clear()
+            started = time.perf_counter()
+            stream, _, is_grounded = answer_question_stream(question, store, llm)
+            next(iter(stream), None)
+            ttft.append((time.perf_counter() - started) * 1000)
+            grounded += is_grounded
+            for _ in stream:
+                pass
+
+        on_disk = sum(p.stat().st_size for p in VectorStore.persisted_files(store.index_path) if p.exists())
+        result = {
+            "chunks": len(store.metadata),
+            "index_kind": index_kind(store.index),
+            "ingest_seconds": round(ingest_s, 2),
+            "ingest_chunks_per_s": round(n / max(ingest_s, 1e-9), 1),
+            "search_ms": _percentiles(search_cold),
+            "search_cached_ms": _percentiles(search_cached),
+            "hybrid_search_ms": _percentiles(hybrid),
+            "search_many_qps": round(len(questions) / max(batch_ms / 1000, 1e-9), 1),
+            "ttft_ms": _percentiles(ttft),
+            "grounded_rate": round(grounded / max(len(ttft), 1), 3),
+            "rss_mb": round(_rss_mb(), 1),
+            "rss_growth_mb": round(_rss_mb() - rss_before, 1),
+            "disk_mb": round(on_disk / 2**20, 1),
+        }
+        store.metadata.close()
+        return result
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline RAG latency/throughput benchmark")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Comma-separated corpus sizes (chunks)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--answers", type=int, default=50, help="Questions streamed for TTFT")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--embed-latency-ms", type=float, default=20.0)
+    parser.add_argument("--embed-per-text-ms", type=float, default=0.05)
+    parser.add_argument("--llm-ttft-ms", type=float, default=150.0)
+    parser.add_argument("--llm-token-ms", type=float, default=5.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", type=Path, help="Also write the JSON report here")
+    args = parser.parse_args()
+    setup_logging()
+
+    report = {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "index_kind_setting": settings.index_kind,
+        "hybrid_retrieval": settings.hybrid_retrieval,
+        "config": {key: value for key, value in vars(args).items() if key != "out"},
+        "results": {},
+    }
+    for size in (int(s) for s in args.sizes.split(",") if s.strip()):
+        report["results"][str(size)] = run_size(size, args)
+        print(f"{size} chunks: {json.dumps(report['results'][str(size)])}", flush=True)
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.out:
+        args.out.write_text(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,7 @@ from typing import List
 
 from config.logging_config import setup_logging
 from config.settings import settings
-from rag.retrieval import answer_question
+from rag.retrieval import answer_question, retrieve_many
 from services.resources import get_llm, get_store
 
 
@@ -25,10 +25,12 @@ def main() -> None:
     eval_path = Path(__file__).parent / "sample_eval.csv"
     questions = load_eval_questions(eval_path)
     results = []
-    for row in questions:
+    # One batched embedding (and index search) for every question up front.
+    all_hits = retrieve_many([row["question"] for row in questions], store)
+    for row, hits in zip(questions, all_hits):
         q = row["question"]
         expected_source = row.get("expected_source", "")
-        out = answer_question(q, store, llm)
+        out = answer_question(q, store, llm, hits=hits)
         found = any(expected_source in cite.get("source", "") for cite in out["citations"])
         grounded = out["answer"].strip().lower() != "no information found."
         results.append({"question": q, "hit_expected": found, "grounded": grounded})
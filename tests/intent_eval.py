@@ -0,0 +1,55 @@
+import csv
+import json
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+from config.logging_config import setup_logging
+from rag.intent import get_local_classifier
+from rag.retrieval import classify_intent_llm
+from services.resources import get_llm, get_store
+
+
+def load_labelled(csv_path: Path) -> List[Dict[str, str]]:
+    with csv_path.open() as f:
+        return list(csv.DictReader(f))
+
+
+def main() -> None:
+    setup_logging()
+    store = get_store()
+    llm = get_llm()
+    classifier = get_local_classifier(store.embedder)
+    rows = load_labelled(Path(__file__).parent / "intent_eval.csv")
+    classifier.predict("warm up")  # build centroids outside the timed loop
+    local_correct = llm_correct = agree = covered = 0
+    latencies_ms: List[float] = []
+    for row in rows:
+        q, expected = row["question"], row["label"]
+        start = time.perf_counter()
+        local, confidence = classifier.predict(q, store.embed_query)
+        latencies_ms.append((time.perf_counter() - start) * 1000)
+        llm_label = classify_intent_llm(q, llm)
+        final = local if local is not None else llm_label
+        covered += local is not None
+        local_correct += final == expected
+        llm_correct += llm_label == expected
+        agree += final == llm_label
+        print(f"{expected:10} local={str(local):10} ({confidence:.2f}) llm={llm_label:10} {q}")
+    total = max(len(rows), 1)
+    summary = {
+        "total": len(rows),
+        "local_coverage": covered / total,
+        "local_with_fallback_accuracy": local_correct / total,
+        "llm_accuracy": llm_correct / total,
+        "agreement_with_llm": agree / total,
+        "local_latency_ms_p50": float(np.percentile(latencies_ms, 50)),
+        "local_latency_ms_p95": float(np.percentile(latencies_ms, 95)),
+    }
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()